@@ -0,0 +1,26 @@
+"""Unique external ids for states and districts
+
+Revision ID: 9c2f41d7a0be
+Revises: 6acdb64e7343
+Create Date: 2021-06-02 19:14:41.527320
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2f41d7a0be'
+down_revision = '6acdb64e7343'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_state_external_id'), 'state', ['external_id'], unique=True)
+    op.create_index(op.f('ix_district_external_id'), 'district', ['external_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_district_external_id'), table_name='district')
+    op.drop_index(op.f('ix_state_external_id'), table_name='state')
@@ -0,0 +1,90 @@
+"""Sequential vs. concurrent district fan-out against a local stub server.
+
+Run from the repository root:
+
+    ENV=prod python -m benchmarks.async_fan_out --districts 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from helpers.async_request_handler import AsyncBaseRequestHandler, fetch_all
+from helpers.base_request_handler import BaseRequestHandler
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps({'centers': []}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--districts', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency)
+    url = 'http://127.0.0.1:{}'.format(server.server_port)
+
+    class SyncCalendar(BaseRequestHandler):
+        def __init__(self, district_id: int):
+            super().__init__(params={'district_id': district_id})
+
+        @property
+        def base_url(self) -> str:
+            return url
+
+        def response_handler(self, response):
+            return json.loads(response.data)
+
+    class AsyncCalendar(AsyncBaseRequestHandler):
+        def __init__(self, district_id: int):
+            super().__init__(params={'district_id': district_id})
+
+        @property
+        def base_url(self) -> str:
+            return url
+
+        def response_handler(self, response):
+            return json.loads(response.data)
+
+    start = time.perf_counter()
+    for district_id in range(args.districts):
+        SyncCalendar(district_id)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    handlers = [AsyncCalendar(i) for i in range(args.districts)]
+    asyncio.run(fetch_all(handlers, limit=args.limit))
+    concurrent = time.perf_counter() - start
+
+    print('districts:  {}'.format(args.districts))
+    print('sequential: {:.2f}s'.format(sequential))
+    print('concurrent: {:.2f}s (limit={})'.format(concurrent, args.limit))
+    print('speedup:    {:.1f}x'.format(sequential / concurrent))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""ORM vs. bulk CRUDBase.create_multi, seeding districts into SQLite.
+
+Run from the repository root:
+
+    ENV=prod python -m benchmarks.bulk_insert --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from crud.base import CRUDBase
+from db.base import Base
+from models.alert_config import AlertConfig  # noqa: F401
+from models.district import District
+from models.filters import ConfiguredFilter  # noqa: F401
+from models.state import State  # noqa: F401
+from schemas.base import BaseSchema
+
+
+class DistrictSchema(BaseSchema):
+    name: str
+    external_id: int
+    state_id: int
+
+
+def timed(url: str, fn: Callable) -> float:
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        fn(db)
+        return time.perf_counter() - started
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--url', help='defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bulk.db')
+    url = args.url or 'sqlite:///{}'.format(path)
+    crud: CRUDBase[District, DistrictSchema] = CRUDBase(District)
+    rows = [DistrictSchema(name='district {}'.format(i), external_id=i,
+                           state_id=1 + i % 36)
+            for i in range(args.rows)]
+
+    orm = timed(url, lambda db: crud.create_multi(db, rows))
+    bulk = timed(url, lambda db: crud.create_multi(db, rows, bulk=True))
+    bulk_ids = timed(url, lambda db: crud.create_multi(
+        db, rows, bulk=True, return_ids=True))
+    print('{} rows'.format(args.rows))
+    print('orm          {:8.2f}s'.format(orm))
+    print('bulk         {:8.2f}s   {:5.1f}x'.format(bulk, orm / bulk))
+    print('bulk + ids   {:8.2f}s   {:5.1f}x'.format(bulk_ids, orm / bulk_ids))
+    if os.path.exists(path):
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Concurrent SQLite writers and readers: the old engine vs. create_db_engine.
+
+Run from the repository root:
+
+    ENV=prod python -m benchmarks.db_concurrency --writers 4 --readers 8
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from db.base import Base, create_db_engine
+from models.alert_config import AlertConfig
+from models.district import District  # noqa: F401
+from models.filters import ConfiguredFilter  # noqa: F401
+from models.state import State  # noqa: F401
+
+
+def run(
+    engine: Engine, writers: int, readers: int, duration: float
+) -> Dict[str, float]:
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    counts: Dict[str, float] = {'writes': 0, 'reads': 0, 'locked': 0}
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def write() -> None:
+        db = session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                db.add(AlertConfig(district_id=1, chat_id='c', name='n'))
+                db.commit()
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    counts['locked'] += 1
+                continue
+            with lock:
+                counts['writes'] += 1
+                latencies.append(time.perf_counter() - started)
+        db.close()
+
+    def read() -> None:
+        db = session()
+        while not stop.is_set():
+            try:
+                db.execute(select(func.count(AlertConfig.id))).scalar()
+                db.execute(select(AlertConfig).order_by(
+                    AlertConfig.id.desc()).limit(50)).all()
+                db.commit()
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    counts['locked'] += 1
+                continue
+            with lock:
+                counts['reads'] += 1
+        db.close()
+
+    threads = ([threading.Thread(target=write) for _ in range(writers)]
+               + [threading.Thread(target=read) for _ in range(readers)])
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    latencies.sort()
+    counts['p99_write_ms'] = (
+        latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    engines: Dict[str, Callable[[str], Engine]] = {
+        'default': lambda url: create_engine(
+            url, connect_args={'check_same_thread': False}),
+        'tuned': create_db_engine,
+    }
+    for name, factory in engines.items():
+        url = 'sqlite:///{}'.format(os.path.join(directory, name + '.db'))
+        result = run(factory(url), args.writers, args.readers, args.duration)
+        print('{:<8} writes/s {:8.0f}   reads/s {:8.0f}   locked {:5.0f}   '
+              'p99 write {:8.1f}ms'.format(
+                  name, result['writes'] / args.duration,
+                  result['reads'] / args.duration, result['locked'],
+                  result['p99_write_ms']))
+
+
+if __name__ == '__main__':
+    main()
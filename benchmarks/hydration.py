@@ -0,0 +1,59 @@
+"""jsonable_encoder vs. column map hydration in CRUDBase.set_data_for_update.
+
+Run from the repository root:
+
+    ENV=prod python -m benchmarks.hydration --rows 100000
+"""
+import argparse
+import time
+from typing import Callable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from crud.base import CRUDBase
+from models.alert_config import AlertConfig  # noqa: F401
+from models.district import District
+from models.filters import ConfiguredFilter  # noqa: F401
+from models.state import State  # noqa: F401
+from schemas.base import BaseSchema
+
+
+class DistrictSchema(BaseSchema):
+    name: str
+    external_id: Optional[int]
+
+
+def encoder_update(db_obj, obj_in):
+    """set_data_for_update as it was before the column map."""
+    obj_data = jsonable_encoder(db_obj)
+    update_data = obj_in.dict(exclude_unset=True)
+    for field in obj_data:
+        if field in update_data:
+            setattr(db_obj, field, update_data[field])
+
+
+def per_row(update: Callable, db_obj, objs_in: List[DistrictSchema]) -> float:
+    started = time.perf_counter()
+    for obj_in in objs_in:
+        update(db_obj, obj_in)
+    return (time.perf_counter() - started) / len(objs_in)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    db_obj = District(name='bench', external_id=0, state_id=1)
+    objs_in = [DistrictSchema(name='district {}'.format(i), external_id=i)
+               for i in range(args.rows)]
+    encoder = per_row(encoder_update, db_obj, objs_in)
+    columns = per_row(CRUDBase.set_data_for_update, db_obj, objs_in)
+    print('{} updates'.format(args.rows))
+    print('jsonable_encoder {:8.2f}us per row'.format(encoder * 1e6))
+    print('column map       {:8.2f}us per row   {:5.1f}x'.format(
+        columns * 1e6, encoder / columns))
+
+
+if __name__ == '__main__':
+    main()
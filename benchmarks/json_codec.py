@@ -0,0 +1,98 @@
+"""Stdlib json / jsonable_encoder vs. helpers.json_codec on CoWIN payloads.
+
+Run from the repository root:
+
+    ENV=prod python -m benchmarks.json_codec --centers 200 --rounds 50
+"""
+import argparse
+import json
+import timeit
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from helpers import json_codec
+from schemas.base import BaseSchema
+
+VACCINES = ['COVISHIELD', 'COVAXIN', 'SPUTNIK V']
+
+
+class AlertConfigSchema(BaseSchema):
+    district_id: int
+    chat_id: str
+    name: str
+    description: Optional[str]
+
+
+def calendar_payload(centers: int) -> dict:
+    """A calendarByDistrict response with a week of sessions per center."""
+    start = date(2021, 5, 20)
+    return {'centers': [
+        {
+            'center_id': 500000 + i,
+            'name': 'Primary Health Centre {}'.format(i),
+            'address': 'Main Road, Ward {}'.format(i % 40),
+            'state_name': 'Karnataka',
+            'district_name': 'BBMP',
+            'block_name': 'South',
+            'pincode': 560000 + i % 100,
+            'lat': 12, 'long': 77,
+            'from': '09:00:00', 'to': '17:00:00',
+            'fee_type': 'Free' if i % 3 else 'Paid',
+            'sessions': [
+                {
+                    'session_id': '{}-{}'.format(i, d),
+                    'date': (start + timedelta(days=d)).strftime('%d-%m-%Y'),
+                    'available_capacity': (i * d) % 50,
+                    'available_capacity_dose1': (i * d) % 30,
+                    'available_capacity_dose2': (i * d) % 20,
+                    'min_age_limit': 18 if (i + d) % 2 else 45,
+                    'vaccine': VACCINES[(i + d) % 3],
+                    'slots': ['09:00AM-11:00AM', '11:00AM-01:00PM',
+                              '01:00PM-03:00PM', '03:00PM-05:00PM'],
+                }
+                for d in range(7)
+            ],
+        }
+        for i in range(centers)
+    ]}
+
+
+def report(name: str, baseline: float, candidate: float) -> None:
+    print('{:<20} stdlib {:8.2f}ms   {} {:8.2f}ms   {:5.1f}x'.format(
+        name, baseline * 1000, json_codec.BACKEND, candidate * 1000,
+        baseline / candidate))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--centers', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    payload = calendar_payload(args.centers)
+    encoded = json.dumps(payload).encode('utf-8')
+    schemas = [
+        AlertConfigSchema(district_id=i, chat_id=str(i), name='alert')
+        for i in range(1000)
+    ]
+    print('payload: {} centers, {:.0f} KiB'.format(
+        args.centers, len(encoded) / 1024))
+
+    def timed(fn) -> float:
+        return timeit.timeit(fn, number=args.rounds) / args.rounds
+
+    report('encode body',
+           timed(lambda: json.dumps(payload).encode('utf-8')),
+           timed(lambda: json_codec.dumps(payload)))
+    report('decode response',
+           timed(lambda: json.loads(encoded)),
+           timed(lambda: json_codec.loads(encoded)))
+    report('crud encode x1000',
+           timed(lambda: [jsonable_encoder(s) for s in schemas]),
+           timed(lambda: [json_codec.to_builtins(s) for s in schemas]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from typing import Dict, List, Union
+from enum import Enum
+
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from crud.base import CRUDBase
+from models.alert_config import AlertConfig
+from models.district import District
+from models.filters import ConfiguredFilter  # noqa: F401
+from models.state import State  # noqa: F401
+from schemas.alert_config import AlertConfigSchema
+
+
+class CRUDAlertConfig(CRUDBase[AlertConfig, AlertConfigSchema]):
+    LOADER_PRESETS = {
+        # what filter matching needs: one query for the configs with their
+        # district and state joined in, one for all of their filters
+        'matching': (
+            selectinload(AlertConfig.configured_filters),
+            joinedload(AlertConfig.district).joinedload(District.state),
+        ),
+        'filters': (
+            selectinload(AlertConfig.configured_filters),
+        ),
+    }
+
+    def get_matching_view(
+        self,
+        db: Session,
+        filters: Dict[str, Union[str, int, Enum]] = None,
+        after_id: int = 0,
+        limit: int = 1000
+    ) -> List[AlertConfig]:
+        """A page of configs loaded for matching, in two queries."""
+        return self.get_multi(
+            db, filters, limit=limit, after_id=after_id, options='matching')
+
+
+alert_config = CRUDAlertConfig(AlertConfig)
@@ -0,0 +1,222 @@
+from typing import (
+    Any, AsyncIterator, Dict, List, Optional, Sequence, Type, Union)
+from contextlib import asynccontextmanager
+from enum import Enum
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.base import (
+    BATCH_FLUSH_SIZE, BATCH_KEY, BIND_CHUNK_SIZE, BULK_CHUNK_SIZE, CRUDBase,
+    CRUDCore, Loader, ModelType, SchemaType, UnitOfWork, UpdateItem)
+
+
+class AsyncCRUDBase(CRUDCore[ModelType, SchemaType]):
+    """
+    CRUD object on an AsyncSession.
+
+    Reads and single row writes are native awaits. The multi row and bulk
+    writes run CRUDBase's implementations through `AsyncSession.run_sync`,
+    which still does its I/O on the asyncio driver. Listeners are called
+    the same way, so they receive a regular Session as they do with
+    CRUDBase. Batches are kept on the underlying Session, so the writes
+    run through `run_sync` join them too.
+    """
+
+    def __init__(self, model: Type[ModelType]):
+        super().__init__(model)
+        # runs the multi row and bulk writes, telling the same listeners
+        self.sync: CRUDBase[ModelType, SchemaType] = CRUDBase(model)
+        self.sync.listeners = self.listeners
+
+    @asynccontextmanager
+    async def batch(
+        self, db: AsyncSession, flush_size: int = BATCH_FLUSH_SIZE
+    ) -> AsyncIterator[UnitOfWork]:
+        """The counterpart of `CRUDBase.batch` on an AsyncSession."""
+        work = self.current_batch(db.sync_session)
+        if work is not None:
+            yield work
+            return
+        work = db.sync_session.info[BATCH_KEY] = UnitOfWork(flush_size)
+        try:
+            yield work
+            await db.flush()
+            work.resolve_ids()
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            db.sync_session.info.pop(BATCH_KEY, None)
+        await db.run_sync(work.notify)
+
+    async def commit(self, db: AsyncSession, changes: int = 1) -> bool:
+        work = self.current_batch(db.sync_session)
+        if work is None:
+            await db.commit()
+            return True
+        await db.run_sync(work.add, changes)
+        return False
+
+    async def wrote(self, db: AsyncSession, written: List[Any]) -> None:
+        work = self.current_batch(db.sync_session)
+        if work is not None:
+            work.written.setdefault(self, []).extend(written)
+        elif self.listeners:
+            await db.run_sync(
+                self.notify_write,
+                [item if isinstance(item, int) else item.id
+                 for item in written])
+
+    async def removed(self, db: AsyncSession, ids: List[int]) -> None:
+        work = self.current_batch(db.sync_session)
+        if work is not None:
+            work.removed.setdefault(self, []).extend(ids)
+        elif self.listeners:
+            await db.run_sync(self.notify_remove, ids)
+
+    async def save(
+        self, db: AsyncSession, db_objs: List[ModelType], refresh: bool = None
+    ) -> Optional[List[int]]:
+        """The counterpart of `CRUDBase.save` on an AsyncSession."""
+        ids = None
+        if self.current_batch(db.sync_session) is None:
+            await db.flush()
+            ids = [db_obj.id for db_obj in db_objs]
+        committed = await self.commit(db, len(db_objs))
+        if refresh or (refresh is None and committed):
+            if not committed:
+                await db.flush()
+            for db_obj in db_objs:
+                await db.refresh(db_obj)
+        await self.wrote(db, db_objs if ids is None else ids)
+        return ids
+
+    async def get_by_id(
+        self, db: AsyncSession, _id: int = None, options: Loader = None
+    ) -> Optional[ModelType]:
+        statement = self.read_statement('by_id', options=options)
+        result = await db.execute(statement, {'_id': _id})
+        return self.read_entities(result, options).first()
+
+    async def get(
+        self,
+        db: AsyncSession,
+        filters: Dict[str, Union[str, int, Enum]],
+        options: Loader = None
+    ) -> Optional[ModelType]:
+        statement = self.read_statement('first', filters, options=options)
+        result = await db.execute(statement, self.read_params(filters))
+        return self.read_entities(result, options).first()
+
+    async def get_multi(
+        self, db: AsyncSession, filters: Dict[str, Union[str, int, Enum]] = None,
+            skip: int = 0, limit: int = 100, after_id: int = None,
+            columns: Sequence[str] = None, options: Loader = None
+    ) -> List[Any]:
+        if after_id is not None:
+            statement = self.read_statement('keyset', filters, columns, options)
+            params = self.read_params(filters, _after_id=after_id, _limit=limit)
+        else:
+            statement = self.read_statement('page', filters, columns, options)
+            params = self.read_params(filters, _skip=skip, _limit=limit)
+        result = await db.execute(statement, params)
+        if columns:
+            return result.all()
+        return self.read_entities(result, options).all()
+
+    async def iter_all(
+        self, db: AsyncSession, filters: Dict[str, Union[str, int, Enum]] = None,
+            columns: Sequence[str] = None, chunk_size: int = 1000,
+            options: Loader = None
+    ) -> AsyncIterator[Any]:
+        statement = (self.build_select(filters, columns, options)
+                     .order_by(self.model.id))
+        result = await db.stream(statement)
+        rows = result if columns else result.scalars()
+        async for partition in rows.partitions(chunk_size):
+            for row in partition:
+                yield row
+
+    async def create(
+        self, db: AsyncSession, obj_in: SchemaType, refresh: bool = None
+    ) -> ModelType:
+        db_obj = self.build(obj_in)
+        db.add(db_obj)
+        await self.save(db, [db_obj], refresh)
+        return db_obj
+
+    async def create_multi(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[Union[SchemaType, Dict[str, Any]]],
+        bulk: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        return_ids: bool = False
+    ) -> Optional[List[int]]:
+        return await db.run_sync(
+            self.sync.create_multi, objs_in, bulk, chunk_size, return_ids)
+
+    async def upsert_multi(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[Union[SchemaType, Dict[str, Any]]],
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> int:
+        return await db.run_sync(self.sync.upsert_multi, objs_in, chunk_size)
+
+    async def update(
+        self,
+        db: AsyncSession,
+        db_obj: ModelType,
+        obj_in: Union[SchemaType, Dict[str, Any]],
+        refresh: bool = None
+    ) -> ModelType:
+        self.set_data_for_update(db_obj, obj_in)
+        db.add(db_obj)
+        await self.save(db, [db_obj], refresh)
+        return db_obj
+
+    async def update_multi(
+        self,
+        db: AsyncSession,
+        objs: Sequence[UpdateItem],
+        bulk: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> Optional[int]:
+        return await db.run_sync(
+            self.sync.update_multi, objs, bulk, chunk_size)
+
+    async def remove_with_id(self, db: AsyncSession, _id: int) -> ModelType:
+        obj = await db.get(self.model, _id)
+        await db.delete(obj)
+        await self.commit(db)
+        await self.removed(db, [_id])
+        return obj
+
+    async def remove_multi_with_id(
+        self,
+        db: AsyncSession,
+        ids: List[int],
+        bulk: bool = False,
+        chunk_size: int = BIND_CHUNK_SIZE
+    ) -> Optional[int]:
+        return await db.run_sync(
+            self.sync.remove_multi_with_id, ids, bulk, chunk_size)
+
+    async def remove(self, db: AsyncSession, obj: ModelType) -> ModelType:
+        _id = obj.id
+        await db.delete(obj)
+        await self.commit(db)
+        await self.removed(db, [_id])
+        return obj
+
+    async def remove_multi(
+        self,
+        db: AsyncSession,
+        objs: List[ModelType],
+        bulk: bool = False,
+        chunk_size: int = BIND_CHUNK_SIZE
+    ) -> Optional[int]:
+        return await db.run_sync(
+            self.sync.remove_multi, objs, bulk, chunk_size)
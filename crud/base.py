@@ -1,17 +1,140 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import (
+    Any, Dict, Generic, Iterator, List, Optional, Sequence, Type, TypedDict,
+    TypeVar, Union, cast)
+from contextlib import contextmanager
 from enum import Enum
+from functools import lru_cache
 
-from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Table, bindparam, delete, func, insert, inspect, select, tuple_, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Result
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.orm import ONETOMANY, Query, Session
+from sqlalchemy.sql import Select
+from sqlalchemy.orm.attributes import set_committed_value
 
+from config import APP
 from db.base import BaseModel as Base
+from helpers.ttl_cache import TTLCache
 
 ModelType = TypeVar("ModelType", bound=Base)
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
+# loader options (selectinload(...), joinedload(...)) or the name of one
+# of the CRUD object's LOADER_PRESETS
+Loader = Union[str, Sequence[Any]]
 
+# read statements kept per CRUD object, one per distinct shape of call
+STATEMENT_CACHE_SIZE = APP['database'].get('statement_cache_size', 128)
+
+# rows per executemany/commit in the bulk paths, small enough to keep the
+# driver's parameter buffers and the transaction journal modest
+BULK_CHUNK_SIZE = 5000
+# ids per `IN (...)` list, well under SQLite's historical limit of 999
+# bound parameters per statement
+BIND_CHUNK_SIZE = 500
+
+# changes a batch sends to the database at a time
+BATCH_FLUSH_SIZE = 1000
+# key of the active UnitOfWork in Session.info
+BATCH_KEY = 'crud_batch'
+
+# dialects whose insert() supports ON CONFLICT ... DO UPDATE
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class _UpdateChanges(TypedDict):
+    obj_in: Union[BaseModel, Dict[str, Any]]
+
+
+class UpdateItem(_UpdateChanges, total=False):
+    """An item of `CRUDBase.update_multi`: the changes and the loaded
+    object they apply to, or in bulk mode just the object's id.
+    """
+    db_obj: Any
+    id: int
+
+
+class CRUDListener:
+    """Told about the ids a CRUDBase has written or removed, after commit."""
+
+    def after_write(self, db: Session, ids: List[int]) -> None:
+        pass
+
+    def after_remove(self, db: Session, ids: List[int]) -> None:
+        pass
+
+
+@lru_cache(maxsize=None)
+def column_map(model: type) -> Dict[str, str]:
+    """Attribute name -> column name of every column of `model`, read once
+    from its mapper.
+    """
+    return {attr.key: attr.columns[0].key
+            for attr in inspect(model).column_attrs}
+
+
+def schema_fields(
+    obj_in: Union[BaseModel, Dict[str, Any]], exclude_unset: bool = False
+) -> Dict[str, Any]:
+    """The field values of `obj_in`, as they are, without encoding them.
+
+    Do not modify the result, it may be the schema's own `__dict__`.
+    """
+    if isinstance(obj_in, dict):
+        return obj_in
+    if exclude_unset:
+        values = obj_in.__dict__
+        return {field: values[field] for field in obj_in.__fields_set__}
+    return obj_in.__dict__
+
+
+class UnitOfWork:
+    """State of a `CRUDBase.batch` or `AsyncCRUDBase.batch` on one session."""
+
+    def __init__(self, flush_size: int = BATCH_FLUSH_SIZE) -> None:
+        self.flush_size = flush_size
+        self.pending = 0
+        self.flushes = 0
+        # per CRUD object, written objects or ids and removed ids, whose
+        # listeners are told once the batch has committed
+        self.written: Dict['CRUDCore', List[Any]] = {}
+        self.removed: Dict['CRUDCore', List[int]] = {}
+
+    def add(self, db: Session, changes: int) -> None:
+        self.pending += changes
+        if self.pending >= self.flush_size:
+            db.flush()
+            self.flushes += 1
+            self.pending = 0
+
+    def resolve_ids(self) -> None:
+        """Swap written objects for their ids while they are still loaded;
+        the commit expires them.
+        """
+        for written in self.written.values():
+            written[:] = [item if isinstance(item, int) else item.id
+                          for item in written]
+
+    def notify(self, db: Session) -> None:
+        for crud, written in self.written.items():
+            crud.notify_write(db, written)
+        for crud, removed in self.removed.items():
+            crud.notify_remove(db, removed)
+
+
+class CRUDCore(Generic[ModelType, SchemaType]):
+    """
+    The parts of a CRUD object that do no I/O, shared by CRUDBase and
+    AsyncCRUDBase: read statements, loader presets, listeners and building
+    rows and model instances.
+    """
+    LOADER_PRESETS: Dict[str, Sequence[Any]] = {}
 
-class CRUDBase(Generic[ModelType, SchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -21,94 +144,663 @@ class CRUDBase(Generic[ModelType, SchemaType]):
         * `model`: A SQLAlchemy model class
         """
         self.model = model
+        self.listeners: List[CRUDListener] = []
+        self.statements = TTLCache(STATEMENT_CACHE_SIZE)
+        self.compiled_hits = 0
+        self.compiled_misses = 0
+
+    @property
+    def table(self) -> Table:
+        """The model's table, for the Core statements of the bulk paths."""
+        return cast(Any, self.model).__table__
+
+    @property
+    def model_columns(self) -> Dict[str, str]:
+        return column_map(cast(type, self.model))
+
+    def add_listener(self, listener: CRUDListener) -> None:
+        self.listeners.append(listener)
+
+    def notify_write(self, db: Session, ids: List[int]) -> None:
+        for listener in self.listeners:
+            listener.after_write(db, ids)
+
+    def notify_remove(self, db: Session, ids: List[int]) -> None:
+        for listener in self.listeners:
+            listener.after_remove(db, ids)
+
+    @staticmethod
+    def current_batch(db: Session) -> Optional[UnitOfWork]:
+        return db.info.get(BATCH_KEY)
+
+    def loader_options(self, options: Optional[Loader]) -> Sequence[Any]:
+        if isinstance(options, str):
+            if options not in self.LOADER_PRESETS:
+                raise ValueError('{} has no loader preset {!r}'.format(
+                    type(self).__name__, options))
+            return self.LOADER_PRESETS[options]
+        return options or ()
 
-    def get_by_id(self, db: Session, _id: int = None) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == _id).first()
+    def read_statement(
+        self,
+        shape: str,
+        filters: Dict[str, Union[str, int, Enum]] = None,
+        columns: Sequence[str] = None,
+        options: Loader = None
+    ) -> Select:
+        """
+        The statement behind a read, with every value (filter values, id,
+        limit, offset) left as a bound parameter; see `read_params`.
+
+        `shape` is one of 'by_id', 'first', 'page' or 'keyset'. Statements
+        are kept per shape, filter fields (and which of them are None, as
+        those compile to `IS NULL`), columns and loader preset, so a
+        repeated call reuses the same statement object and SQLAlchemy's
+        compiled cache finds its SQL without compiling it again. Calls with
+        ad hoc loader options are not cached.
+        """
+        # `= NULL` matches nothing, so a None filter is part of the shape
+        fields = tuple(sorted(
+            (field, value is None) for field, value in filters.items())
+        ) if filters else ()
+        cacheable = options is None or isinstance(options, str)
+        key = (shape, fields, tuple(columns or ()), options)
+        if cacheable:
+            statement = self.statements.get(key)
+            if statement is not None:
+                return statement
+        statement = self.build_select(columns=columns, options=options)
+        for field, is_null in fields:
+            column = getattr(self.model, field)
+            statement = statement.where(
+                column.is_(None) if is_null
+                else column == bindparam('f_' + field))
+        if shape == 'by_id':
+            statement = statement.where(
+                self.model.id == bindparam('_id')).limit(1)
+        elif shape == 'first':
+            statement = statement.limit(1)
+        elif shape == 'keyset':
+            statement = (statement.where(self.model.id > bindparam('_after_id'))
+                         .order_by(self.model.id).limit(bindparam('_limit')))
+        else:
+            statement = (statement.offset(bindparam('_skip'))
+                         .limit(bindparam('_limit')))
+        if cacheable:
+            self.statements.set(key, statement)
+        return statement
+
+    @staticmethod
+    def read_params(
+        filters: Dict[str, Union[str, int, Enum]] = None, **params: Any
+    ) -> Dict[str, Any]:
+        if filters:
+            params.update(
+                ('f_' + field, value) for field, value in filters.items()
+                if value is not None)
+        return params
+
+    @staticmethod
+    def read_entities(result: Result, options: Loader = None) -> Any:
+        entities = result.scalars()
+        # joined eager loads of collections repeat the parent rows
+        return entities.unique() if options else entities
+
+    def statement_stats(self) -> Dict[str, float]:
+        compiled = self.compiled_hits + self.compiled_misses
+        return {
+            'statements': len(self.statements),
+            'statement_hits': self.statements.hits,
+            'statement_misses': self.statements.misses,
+            'compiled_hits': self.compiled_hits,
+            'compiled_misses': self.compiled_misses,
+            'compiled_hit_ratio': (self.compiled_hits / compiled
+                                   if compiled else 0.0),
+        }
+
+    def build_select(
+        self,
+        filters: Dict[str, Union[str, int, Enum]] = None,
+        columns: Sequence[str] = None,
+        options: Loader = None
+    ) -> Select:
+        """2.0 style counterpart of `query`, usable on any session."""
+        if columns:
+            statement = select(*[getattr(self.model, c) for c in columns])
+        else:
+            statement = select(self.model).options(
+                *self.loader_options(options))
+        return statement.filter_by(**filters) if filters else statement
+
+    def build(self, obj_in: Union[SchemaType, Dict[str, Any]]) -> ModelType:
+        """A new, unsaved model instance holding the fields of `obj_in`."""
+        return self.model(**schema_fields(obj_in))  # type: ignore
+
+    def get_bulk_rows(
+        self, objs_in: Sequence[Union[SchemaType, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Column values of every item, ignoring fields the table lacks, so
+        every row has the same keys as executemany requires.
+
+        Columns with a default (`id`, `created_at`, ...) that are None in
+        every row are left out, so the database fills them in, as it does
+        for ORM inserts.
+        """
+        table = self.table
+        columns = self.model_columns
+        rows = []
+        for obj_in in objs_in:
+            data = schema_fields(obj_in)
+            rows.append({column: data.get(key)
+                         for key, column in columns.items()})
+        defaulted = [
+            column.key for column in table.columns
+            if column.primary_key or column.default is not None
+            or column.server_default is not None
+        ]
+        for key in defaulted:
+            if all(row.get(key) is None for row in rows):
+                for row in rows:
+                    del row[key]
+        return rows
+
+    @staticmethod
+    def set_data_for_update(db_obj, obj_in):
+        columns = column_map(type(db_obj))
+        for field, value in schema_fields(obj_in, exclude_unset=True).items():
+            if field in columns:
+                setattr(db_obj, field, value)
+
+
+class CRUDBase(CRUDCore[ModelType, SchemaType]):
+    """CRUD object on a Session."""
+
+    @contextmanager
+    def batch(
+        self, db: Session, flush_size: int = BATCH_FLUSH_SIZE
+    ) -> Iterator[UnitOfWork]:
+        """
+        Group the writes made on `db` inside the block into one transaction.
+
+        Writes no longer commit (or refresh, unless asked to) one by one;
+        changes are flushed every `flush_size` of them and committed once
+        when the block exits. An exception rolls everything back.
+        Listeners hear about the writes after the commit. A batch opened
+        inside another one on the same session joins it.
+        """
+        work = self.current_batch(db)
+        if work is not None:
+            yield work
+            return
+        work = db.info[BATCH_KEY] = UnitOfWork(flush_size)
+        try:
+            yield work
+            db.flush()
+            work.resolve_ids()
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.info.pop(BATCH_KEY, None)
+        work.notify(db)
+
+    def commit(self, db: Session, changes: int = 1) -> bool:
+        """Commit, or count `changes` towards the active batch's next flush.
+
+        Returns whether it committed.
+        """
+        work = self.current_batch(db)
+        if work is None:
+            db.commit()
+            return True
+        work.add(db, changes)
+        return False
+
+    def wrote(self, db: Session, written: List[Any]) -> None:
+        """Tell listeners about written objects (or ids), or defer it to the
+        end of the active batch.
+        """
+        work = self.current_batch(db)
+        if work is not None:
+            work.written.setdefault(self, []).extend(written)
+        elif self.listeners:
+            self.notify_write(db, [item if isinstance(item, int) else item.id
+                                   for item in written])
+
+    def removed(self, db: Session, ids: List[int]) -> None:
+        work = self.current_batch(db)
+        if work is not None:
+            work.removed.setdefault(self, []).extend(ids)
+        else:
+            self.notify_remove(db, ids)
+
+    def save(
+        self, db: Session, db_objs: List[ModelType], refresh: bool = None
+    ) -> Optional[List[int]]:
+        """Commit `db_objs` and reload them from the database if `refresh`,
+        which defaults to refreshing only outside of a batch.
+
+        Returns the ids of `db_objs` when it committed. They are read after
+        a flush and before the commit expires the objects, which would
+        otherwise cost a SELECT per object.
+        """
+        ids = None
+        if self.current_batch(db) is None:
+            db.flush()
+            ids = [db_obj.id for db_obj in db_objs]
+        committed = self.commit(db, len(db_objs))
+        if refresh or (refresh is None and committed):
+            if not committed:
+                db.flush()
+            for db_obj in db_objs:
+                db.refresh(db_obj)
+        self.wrote(db, db_objs if ids is None else ids)
+        return ids
+
+    def execute_read(
+        self, db: Session, statement: Select, params: Dict[str, Any]
+    ) -> Result:
+        result = db.execute(statement, params)
+        # ORM results wrap the cursor result that knows about the cache
+        context = getattr(getattr(result, 'raw', result), 'context', None)
+        if context is not None:
+            if context.cache_hit is CACHE_HIT:
+                self.compiled_hits += 1
+            else:
+                self.compiled_misses += 1
+        return result
+
+    def get_by_id(
+        self, db: Session, _id: int = None, options: Loader = None
+    ) -> Optional[ModelType]:
+        statement = self.read_statement('by_id', options=options)
+        result = self.execute_read(db, statement, {'_id': _id})
+        return self.read_entities(result, options).first()
 
     def get(
         self,
         db: Session,
-        filters: Dict[str, Union[str, int, Enum]]
+        filters: Dict[str, Union[str, int, Enum]],
+        options: Loader = None
     ) -> Optional[ModelType]:
-        return db.query(self.model).filter_by(**filters).first()
+        statement = self.read_statement('first', filters, options=options)
+        result = self.execute_read(db, statement, self.read_params(filters))
+        return self.read_entities(result, options).first()
+
+    def query(
+        self,
+        db: Session,
+        filters: Dict[str, Union[str, int, Enum]] = None,
+        columns: Sequence[str] = None,
+        options: Loader = None
+    ) -> Query:
+        """
+        Query of the model, or of just `columns` as plain row tuples.
+
+        `options` decides how relationships are loaded, as loader options
+        or the name of a preset; it does not apply to column queries.
+        """
+        if columns:
+            query = db.query(*[getattr(self.model, c) for c in columns])
+        else:
+            query = db.query(self.model).options(*self.loader_options(options))
+        return query.filter_by(**filters) if filters else query
 
     def get_multi(
         self, db: Session, filters: Dict[str, Union[str, int, Enum]] = None,
-            skip: int = 0, limit: int = 100
-    ) -> List[ModelType]:
-        query = (db.query(self.model).filter_by(**filters)
-                 if filters else db.query(self.model))
-        return query.offset(skip).limit(limit).all()
-
-    def create(self, db: Session, obj_in: SchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)  # type: ignore
+            skip: int = 0, limit: int = 100, after_id: int = None,
+            columns: Sequence[str] = None, options: Loader = None
+    ) -> List[Any]:
+        """
+        Read a page of rows.
+
+        Pass the last id of the previous page as `after_id` to seek on the
+        primary key instead of using `skip`, which keeps deep pages as cheap
+        as the first one. With `columns` the page holds tuples of those
+        columns instead of model instances.
+        """
+        if after_id is not None:
+            statement = self.read_statement('keyset', filters, columns, options)
+            params = self.read_params(filters, _after_id=after_id, _limit=limit)
+        else:
+            statement = self.read_statement('page', filters, columns, options)
+            params = self.read_params(filters, _skip=skip, _limit=limit)
+        result = self.execute_read(db, statement, params)
+        if columns:
+            return result.all()
+        return self.read_entities(result, options).all()
+
+    def iter_all(
+        self, db: Session, filters: Dict[str, Union[str, int, Enum]] = None,
+            columns: Sequence[str] = None, chunk_size: int = 1000,
+            options: Loader = None
+    ) -> Iterator[Any]:
+        """
+        Stream every matching row in id order, fetching `chunk_size` rows
+        at a time over a server side cursor where the driver has one.
+        """
+        query = (self.query(db, filters, columns, options)
+                 .order_by(self.model.id)
+                 .execution_options(stream_results=True)
+                 .yield_per(chunk_size))
+        yield from query
+
+    def create(
+        self, db: Session, obj_in: SchemaType, refresh: bool = None
+    ) -> ModelType:
+        db_obj = self.build(obj_in)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self.save(db, [db_obj], refresh)
         return db_obj
 
-    def create_multi(self, db: Session, objs_in: List[SchemaType]) -> None:
+    def create_multi(
+        self,
+        db: Session,
+        objs_in: Sequence[Union[SchemaType, Dict[str, Any]]],
+        bulk: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        return_ids: bool = False
+    ) -> Optional[List[int]]:
+        """
+        Create a row per item of `objs_in`.
+
+        By default every row becomes an ORM object added to the session.
+        With `bulk=True` rows are sent as Core executemany INSERTs of
+        `chunk_size` rows, committed per chunk, without building ORM
+        objects. The new ids are returned when `return_ids` is set.
+        """
+        if bulk:
+            return self.bulk_create(db, objs_in, chunk_size, return_ids)
+        db_objs = []
         for obj_in in objs_in:
-            obj_in_data = jsonable_encoder(obj_in)
-            db_obj = self.model(**obj_in_data)  # type: ignore
+            db_obj = self.build(obj_in)
             db.add(db_obj)
-        db.commit()
+            db_objs.append(db_obj)
+        ids = self.save(db, db_objs, refresh=False)
+        if not return_ids:
+            return None
+        if ids is None:
+            # inside a batch nothing was committed, so the objects are live
+            db.flush()
+            ids = [db_obj.id for db_obj in db_objs]
+        return ids
+
+    def bulk_create(
+        self,
+        db: Session,
+        objs_in: Sequence[Union[SchemaType, Dict[str, Any]]],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        return_ids: bool = False
+    ) -> Optional[List[int]]:
+        table = self.table
+        dialect = db.get_bind().dialect
+        collect_ids = return_ids or bool(self.listeners)
+        ids: List[int] = []
+        rows = self.get_bulk_rows(objs_in)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if not collect_ids:
+                db.execute(insert(table), chunk)
+            elif dialect.insert_executemany_returning:
+                # e.g. psycopg2, which batches the rows into VALUES lists
+                result = db.execute(insert(table).returning(table.c.id), chunk)
+                ids.extend(result.scalars())
+            elif dialect.name == 'sqlite' and not any('id' in r for r in chunk):
+                # the transaction holds SQLite's write lock, so the rows
+                # just inserted took the consecutive rowids up to max(id)
+                db.execute(insert(table), chunk)
+                last_id = db.execute(select(func.max(table.c.id))).scalar()
+                ids.extend(range(last_id - len(chunk) + 1, last_id + 1))
+            else:
+                statement = insert(table)
+                for row in chunk:
+                    ids.extend(db.execute(statement, row).inserted_primary_key)
+            self.commit(db, len(chunk))
+        self.wrote(db, ids)
+        return ids if return_ids else None
+
+    def natural_key_ids(
+        self, db: Session, natural_key: Sequence[str],
+        rows: Sequence[Dict[str, Any]]
+    ) -> List[int]:
+        """Ids of the rows whose natural key values appear in `rows`."""
+        table = self.table
+        key_columns = [table.c[self.model_columns[key]] for key in natural_key]
+        keys = [tuple(row[column.key] for column in key_columns)
+                for row in rows]
+        step = max(BIND_CHUNK_SIZE // len(key_columns), 1)
+        ids: List[int] = []
+        for start in range(0, len(keys), step):
+            chunk = keys[start:start + step]
+            if len(key_columns) == 1:
+                condition = key_columns[0].in_([key for key, in chunk])
+            else:
+                condition = tuple_(*key_columns).in_(chunk)
+            ids.extend(db.execute(select(table.c.id).where(condition)).scalars())
+        return ids
+
+    def upsert_multi(
+        self,
+        db: Session,
+        objs_in: Sequence[Union[SchemaType, Dict[str, Any]]],
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> int:
+        """
+        Insert the rows of `objs_in`, updating the existing rows that share
+        the model's `__natural_key__` instead of failing on them.
+
+        Each chunk is one executemany `INSERT ... ON CONFLICT DO UPDATE`,
+        so running it again with the same data is harmless. Returns the
+        number of rows inserted or updated. When there are listeners, the
+        ids of the upserted rows are looked up by natural key (the upsert
+        cannot return them on every dialect) and reported to them.
+        """
+        natural_key = getattr(self.model, '__natural_key__', None)
+        if not natural_key:
+            raise TypeError(
+                '{} declares no __natural_key__'.format(self.model.__name__))
+        dialect = db.get_bind().dialect
+        if dialect.name not in UPSERT_INSERTS:
+            raise NotImplementedError(
+                'Upserts are not supported on {}'.format(dialect.name))
+        rows = self.get_bulk_rows(objs_in)
+        if not rows:
+            return 0
+        statement = UPSERT_INSERTS[dialect.name](self.table)
+        excluded = set(natural_key) | {'id', 'created_at', 'updated_at'}
+        updates = {key: statement.excluded[key]
+                   for key in rows[0] if key not in excluded}
+        updates['updated_at'] = func.now()
+        statement = statement.on_conflict_do_update(
+            index_elements=list(natural_key), set_=updates)
+        upserted = 0
+        ids: List[int] = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            upserted += db.execute(statement, chunk).rowcount
+            if self.listeners:
+                ids.extend(self.natural_key_ids(db, natural_key, chunk))
+            self.commit(db, len(chunk))
+        self.wrote(db, ids)
+        return upserted
 
     def update(
         self,
         db: Session,
         db_obj: ModelType,
-        obj_in: Union[SchemaType, Dict[str, Any]]
+        obj_in: Union[SchemaType, Dict[str, Any]],
+        refresh: bool = None
     ) -> ModelType:
         self.set_data_for_update(db_obj, obj_in)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self.save(db, [db_obj], refresh)
         return db_obj
 
     def update_multi(
         self,
         db: Session,
-        objs: List[Dict[str, Union[ModelType, Union[SchemaType, Dict[str, Any]]]]],
-    ) -> None:
+        objs: Sequence[UpdateItem],
+        bulk: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> Optional[int]:
+        """
+        Apply `obj_in` to every `db_obj` of `objs`.
+
+        With `bulk=True` the changes are sent as executemany
+        `UPDATE ... WHERE id = :id` statements instead of flushing every
+        object, and the number of updated rows is returned. In that mode
+        an item may give an `id` instead of a loaded `db_obj`.
+        """
+        if bulk:
+            return self.bulk_update(db, objs, chunk_size)
+        db_objs = [obj['db_obj'] for obj in objs]
+        for db_obj, obj in zip(db_objs, objs):
+            self.set_data_for_update(db_obj, obj['obj_in'])
+            db.add(db_obj)
+        self.save(db, db_objs, refresh=False)
+        return None
+
+    def bulk_update(
+        self,
+        db: Session,
+        objs: Sequence[UpdateItem],
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> int:
+        table = self.table
+        columns = self.model_columns
+        # executemany needs the same columns in every row of a statement
+        groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+        loaded = []
         for obj in objs:
             db_obj = obj.get('db_obj')
-            self.set_data_for_update(db_obj, obj.get('obj_in'))
-            db.add(db_obj)
-        db.commit()
+            update_data = schema_fields(obj['obj_in'], exclude_unset=True)
+            values = {key: value for key, value in update_data.items()
+                      if key in columns and key != 'id'}
+            row = {columns[key]: value for key, value in values.items()}
+            row['_id'] = db_obj.id if db_obj is not None else obj['id']
+            keys = frozenset(row).difference(('_id',))
+            groups.setdefault(keys, []).append(row)
+            if db_obj is not None:
+                loaded.append((db_obj, values))
+        updated = 0
+        for keys, rows in groups.items():
+            if not keys:
+                continue
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam('_id'))
+                .values({key: bindparam(key) for key in keys}))
+            for start in range(0, len(rows), chunk_size):
+                result = db.execute(statement, rows[start:start + chunk_size])
+                updated += result.rowcount
+        self.commit(db, len(objs))
+        # keep loaded objects in step without reloading them
+        for db_obj, values in loaded:
+            for key, value in values.items():
+                set_committed_value(db_obj, key, value)
+            db.expire(db_obj, ['updated_at'])
+        self.wrote(db, [row['_id'] for rows in groups.values() for row in rows])
+        return updated
 
     def remove_with_id(self, db: Session, _id: int) -> ModelType:
         obj = db.query(self.model).get(_id)
         db.delete(obj)
-        db.commit()
+        self.commit(db)
+        self.removed(db, [_id])
         return obj
 
-    def remove_multi_with_id(self,  db: Session, ids: List[int]) -> None:
+    def remove_multi_with_id(
+        self,
+        db: Session,
+        ids: List[int],
+        bulk: bool = False,
+        chunk_size: int = BIND_CHUNK_SIZE
+    ) -> Optional[int]:
+        """
+        Delete the rows with `ids`.
+
+        With `bulk=True` this issues `DELETE ... WHERE id IN (...)` per
+        `chunk_size` ids, without loading the objects first, and returns
+        the number of deleted rows. Dependent rows are handled in the same
+        transaction as the ORM would; see `remove_dependents`.
+        """
+        if bulk:
+            return self.bulk_remove(db, ids, chunk_size)
         for _id in ids:
             obj = db.query(self.model).get(_id)
             db.delete(obj)
-        db.commit()
+        self.commit(db, len(ids))
+        self.removed(db, ids)
+        return None
 
-    @staticmethod
-    def remove(db: Session, obj: ModelType) -> ModelType:
+    @classmethod
+    def remove_dependents(cls, db: Session, model: type, ids: List[int]) -> None:
+        """
+        Do to the rows referencing the `model` rows with `ids` what the ORM
+        does when it deletes a parent: delete them when the relationship
+        cascades deletes (and their own dependents first), set their
+        foreign key to NULL otherwise.
+        """
+        for relationship in inspect(model).relationships:
+            if (relationship.direction is not ONETOMANY
+                    or relationship.viewonly or relationship.passive_deletes):
+                continue
+            child = relationship.mapper.class_
+            condition = [
+                getattr(child, remote.key).in_(ids)
+                for _, remote in relationship.local_remote_pairs]
+            if 'delete' in relationship.cascade:
+                child_ids = db.execute(
+                    select(child.id).where(*condition)).scalars().all()
+                if child_ids:
+                    cls.remove_dependents(db, child, child_ids)
+                statement = delete(child).where(*condition)
+            else:
+                statement = update(child).where(*condition).values({
+                    remote.key: None
+                    for _, remote in relationship.local_remote_pairs})
+            db.execute(statement.execution_options(
+                synchronize_session='evaluate'))
+
+    def bulk_remove(
+        self, db: Session, ids: List[int], chunk_size: int = BIND_CHUNK_SIZE
+    ) -> int:
+        removed = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            # dependent rows first, or the foreign keys would dangle (SQLite)
+            # or make the DELETE fail (Postgres)
+            self.remove_dependents(db, self.model, chunk)
+            statement = (
+                delete(self.model)
+                .where(self.model.id.in_(chunk))
+                .execution_options(synchronize_session='evaluate'))
+            removed += db.execute(statement).rowcount
+        self.commit(db, len(ids))
+        self.removed(db, ids)
+        return removed
+
+    def remove(self, db: Session, obj: ModelType) -> ModelType:
+        _id = obj.id
         db.delete(obj)
-        db.commit()
+        self.commit(db)
+        self.removed(db, [_id])
         return obj
 
-    @staticmethod
-    def remove_multi(db: Session, objs: List[ModelType]) -> None:
+    def remove_multi(
+        self,
+        db: Session,
+        objs: List[ModelType],
+        bulk: bool = False,
+        chunk_size: int = BIND_CHUNK_SIZE
+    ) -> Optional[int]:
+        ids = [obj.id for obj in objs]
+        if bulk:
+            return self.bulk_remove(db, ids, chunk_size)
         for obj in objs:
             db.delete(obj)
-        db.commit()
-
-    @staticmethod
-    def set_data_for_update(db_obj, obj_in):
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        self.commit(db, len(objs))
+        self.removed(db, ids)
+        return None
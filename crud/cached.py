@@ -0,0 +1,128 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type, Union
+from enum import Enum
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from config import APP
+from crud.base import CRUDBase, CRUDListener, Loader, ModelType, SchemaType
+from helpers.ttl_cache import TTLCache
+
+CONFIG = APP['database'].get('cache', {})
+
+
+class CacheInvalidator(CRUDListener):
+    """Drops the rows a CachedCRUD writes or removes from its cache."""
+
+    def __init__(self, crud: 'CachedCRUD') -> None:
+        self.crud = crud
+
+    def after_write(self, db: Session, ids: List[int]) -> None:
+        self.crud.invalidate(ids)
+
+    def after_remove(self, db: Session, ids: List[int]) -> None:
+        self.crud.invalidate(ids)
+
+
+class CachedCRUD(CRUDBase[ModelType, SchemaType]):
+    """
+    CRUDBase with a read-through cache for rarely changing models, such as
+    State and District.
+
+    Rows are cached by id and by the model's `__natural_key__` as detached
+    copies of their columns; a hit is merged into the caller's session with
+    `load=False`, so it costs no SQL at all. A row the session already holds
+    is returned as it is, so neither its pending changes nor fresher data
+    it loaded get overwritten by the snapshot. Writes through this object
+    invalidate the rows they touch. Writes made elsewhere are only picked
+    up once the entries expire after `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        model: Type[ModelType],
+        max_entries: int = CONFIG.get('max_entries', 4096),
+        ttl: Optional[float] = CONFIG.get('ttl', 3600)
+    ) -> None:
+        super().__init__(model)
+        self.natural_key: Tuple[str, ...] = tuple(
+            getattr(model, '__natural_key__', ()))
+        self.columns = list(self.model_columns)
+        self.by_id = TTLCache(max_entries, ttl)
+        self.by_key = TTLCache(max_entries, ttl)
+        self.add_listener(CacheInvalidator(self))
+
+    def snapshot(self, db_obj: ModelType) -> ModelType:
+        """A clean, detached copy of the column values of `db_obj`."""
+        copy = self.model(  # type: ignore
+            **{column: getattr(db_obj, column) for column in self.columns})
+        make_transient_to_detached(copy)
+        return copy
+
+    def remember(self, db_obj: ModelType) -> None:
+        snapshot = self.snapshot(db_obj)
+        self.by_id.set(db_obj.id, snapshot)
+        if self.natural_key:
+            self.by_key.set(self.key_of(snapshot), snapshot)
+
+    def key_of(self, db_obj: Any) -> Hashable:
+        return tuple(getattr(db_obj, field) for field in self.natural_key)
+
+    def invalidate(self, ids: List[int]) -> None:
+        for _id in ids:
+            snapshot = self.by_id.pop(_id)
+            if snapshot is not None and self.natural_key:
+                self.by_key.pop(self.key_of(snapshot))
+
+    def clear(self) -> None:
+        self.by_id.clear()
+        self.by_key.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {'by_id': self.by_id.stats(), 'by_key': self.by_key.stats()}
+
+    def attach(self, db: Session, snapshot: ModelType) -> ModelType:
+        """The session's own copy of the cached row, or the snapshot merged
+        into it.
+        """
+        identity_key = inspect(self.model).identity_key_from_primary_key(
+            (snapshot.id,))
+        db_obj = db.identity_map.get(identity_key)
+        if db_obj is not None:
+            return db_obj
+        return db.merge(snapshot, load=False)
+
+    def get_by_id(
+        self, db: Session, _id: int = None, options: Loader = None
+    ) -> Optional[ModelType]:
+        if options:
+            return super().get_by_id(db, _id, options)
+        snapshot = self.by_id.get(_id)
+        if snapshot is not None:
+            return self.attach(db, snapshot)
+        db_obj = super().get_by_id(db, _id)
+        if db_obj is not None:
+            self.remember(db_obj)
+        return db_obj
+
+    def get(
+        self,
+        db: Session,
+        filters: Dict[str, Union[str, int, Enum]],
+        options: Loader = None
+    ) -> Optional[ModelType]:
+        """Served from the cache when `filters` is exactly the natural key."""
+        if (options or not self.natural_key
+                or set(filters) != set(self.natural_key)):
+            return super().get(db, filters, options)
+        key = tuple(filters[field] for field in self.natural_key)
+        snapshot = self.by_key.get(key)
+        if snapshot is not None:
+            return self.attach(db, snapshot)
+        db_obj = super().get(db, filters)
+        if db_obj is not None:
+            self.remember(db_obj)
+        return db_obj
+
+    def get_by_natural_key(self, db: Session, *values: Any) -> Optional[ModelType]:
+        return self.get(db, dict(zip(self.natural_key, values)))
@@ -0,0 +1,6 @@
+from typing import Any
+
+from crud.cached import CachedCRUD
+from models.district import District
+
+district: CachedCRUD[District, Any] = CachedCRUD(District)
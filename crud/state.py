@@ -0,0 +1,6 @@
+from typing import Any
+
+from crud.cached import CachedCRUD
+from models.state import State
+
+state: CachedCRUD[State, Any] = CachedCRUD(State)
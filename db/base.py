@@ -1,23 +1,107 @@
 import inflection
 
 from config import APP
-from contextlib import contextmanager
-from sqlalchemy import create_engine, Column, Integer, TIMESTAMP, func
+from contextlib import asynccontextmanager, contextmanager
+from sqlalchemy import create_engine, event, Column, Integer, TIMESTAMP, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, declared_attr
-from typing import Generator
+from typing import Any, AsyncGenerator, Callable, Dict, Generator, Optional
 
 CONFIG = APP['database']
 
 DATABASE_URL = CONFIG['url']
 
-# check_same_thread is only needed if the db is sqlite
-engine = create_engine(
-    DATABASE_URL, connect_args={'check_same_thread': False}
-)
+
+def set_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute('PRAGMA {}={}'.format(name, value))
+        finally:
+            cursor.close()
+
+
+# asyncio drivers used by create_async_db_engine
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def build_engine(
+    factory: Callable[..., Any], url: str, options: Dict[str, Any]
+) -> Any:
+    # compiled SQL kept per engine, see CRUDBase.read_statement
+    query_cache_size = options.get('query_cache_size', 500)
+    if url.startswith('sqlite'):
+        # check_same_thread is only needed if the db is sqlite
+        engine = factory(
+            url, connect_args={'check_same_thread': False},
+            query_cache_size=query_cache_size)
+        set_sqlite_pragmas(
+            getattr(engine, 'sync_engine', engine),
+            options.get('sqlite', {}).get('pragmas', {}))
+        return engine
+    pool = options.get('pool', {})
+    return factory(
+        url,
+        pool_size=pool.get('size', 5),
+        max_overflow=pool.get('max_overflow', 10),
+        pool_pre_ping=pool.get('pre_ping', True),
+        pool_recycle=pool.get('recycle', -1),
+        query_cache_size=query_cache_size,
+    )
+
+
+def create_db_engine(
+    url: str = DATABASE_URL, options: Dict[str, Any] = CONFIG
+) -> Engine:
+    """
+    Build the engine for `url` from the `database` config.
+
+    SQLite connections get the configured pragmas (WAL, synchronous,
+    mmap, cache and busy timeout) so concurrent readers and the writer do
+    not lock each other out; other databases get a sized, pre-pinged
+    connection pool.
+    """
+    return build_engine(create_engine, url, options)
+
+
+def create_async_db_engine(
+    url: str = DATABASE_URL, options: Dict[str, Any] = CONFIG
+) -> AsyncEngine:
+    """Like create_db_engine, on the asyncio driver of the database."""
+    scheme, rest = url.split('://', 1)
+    scheme = ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)
+    return build_engine(
+        create_async_engine, '{}://{}'.format(scheme, rest), options)
+
+
+engine = create_db_engine()
 
 session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# objects stay usable after commit, lazy loads cannot happen implicitly
+async_session = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False,
+    class_=AsyncSession)
+
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """The process wide async engine, created on first use so the asyncio
+    driver is only needed by code that actually uses it.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
 
 def get_table_name(name: str) -> str:
     return inflection.underscore(name)
@@ -48,3 +132,10 @@ def db_session() -> Generator:
         yield _session
     finally:
         _session.close()
+
+
+@asynccontextmanager
+async def async_db_session() -> AsyncGenerator:
+    """Async counterpart of `db_session`."""
+    async with async_session(bind=get_async_engine()) as _session:
+        yield _session
@@ -1,2 +1,9 @@
 class InvalidInputException(Exception):
     pass
+
+
+class UpstreamRequestException(Exception):
+    def __init__(self, status: int, url: str = None):
+        super().__init__('{} returned status {}'.format(url, status))
+        self.status = status
+        self.url = url
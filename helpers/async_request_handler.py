@@ -0,0 +1,94 @@
+from abc import ABCMeta, abstractmethod
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Iterable, List, Optional
+
+from custom_types import JsonType
+from helpers.base_request_handler import BaseRequestHandler, CONFIG
+
+ASYNC_CONFIG = CONFIG.get('async', {})
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the thread pool that runs the blocking urllib3 calls.
+
+    The threads share the pooled PoolManager of BaseRequestHandler, so
+    concurrency towards a single host stays bounded by the pool size.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=ASYNC_CONFIG.get('max_workers', 32),
+                    thread_name_prefix='request-handler')
+    return _executor
+
+
+class AsyncBaseRequestHandler(BaseRequestHandler, metaclass=ABCMeta):
+    """Request handler that is built first and fired with `await fetch()`.
+
+    Subclasses keep the BaseRequestHandler contract: they provide
+    `base_url` and `response_handler`, and may override the class level
+    METHOD, HEADERS, PARAMS and BODY defaults.
+    """
+
+    @abstractmethod
+    def __init__(
+        self, relative_url: str = None,
+        method: str = None,
+        headers: JsonType = None,
+        params: JsonType = None,
+        body: JsonType = None
+    ) -> None:
+        self.response = {}
+        self.set_request_attributes(
+            relative_url=relative_url, method=method,
+            headers=headers, params=params, body=body)
+
+    async def fetch(self) -> JsonType:
+        loop = asyncio.get_running_loop()
+        self.validate_method_type()
+        fields, encoded_params = self.get_params()
+        key = self.get_request_key(self.get_url(encoded_params), fields)
+        if key is None:
+            return await loop.run_in_executor(get_executor(), self.execute)
+        # identical in-flight fetches on this loop wait for a single
+        # executor job instead of each occupying a worker thread.
+        self.response = await self.SINGLE_FLIGHT.do_async(
+            key, lambda: loop.run_in_executor(get_executor(), self.execute))
+        return self.response
+
+
+async def gather_bounded(
+    aws: Iterable[Awaitable[Any]],
+    limit: int = None,
+    return_exceptions: bool = False
+) -> List[Any]:
+    """Await every awaitable with at most `limit` running at once.
+
+    Results are returned in the order of `aws`, like asyncio.gather.
+    """
+    semaphore = asyncio.Semaphore(limit or ASYNC_CONFIG.get('concurrency', 20))
+
+    async def run(aw: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *(run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
+async def fetch_all(
+    handlers: Iterable[AsyncBaseRequestHandler],
+    limit: int = None,
+    return_exceptions: bool = False
+) -> List[Any]:
+    """Fetch every handler concurrently, e.g. all districts of a state."""
+    return await gather_bounded(
+        (handler.fetch() for handler in handlers),
+        limit=limit, return_exceptions=return_exceptions)
@@ -1,13 +1,92 @@
 from abc import ABCMeta, abstractmethod
 import copy
+import socket
+import threading
 import urllib3
+from urllib3.connection import HTTPConnection
+from urllib3.util import parse_url
 from urllib.parse import urlencode
-import json
-from typing import Optional, List, Tuple
+from typing import Dict, Hashable, Optional, List, Tuple
 from custom_types import JsonType
 from config import APP
+from helpers import json_codec
+from helpers.rate_limiter import RateLimiterRegistry
+from helpers.response_cache import ResponseCache
+from helpers.retry_policy import RetryPolicy
+from helpers.single_flight import SingleFlight
+import errors
 
 CONFIG = APP['base_request_handler']
+POOL_CONFIG = CONFIG.get('pool', {})
+
+# status based retries are left to RETRY_POLICY, urllib3 only retries
+# connection errors and redirects.
+CONNECTION_RETRIES = urllib3.Retry(3, respect_retry_after_header=False)
+
+response_cache = ResponseCache(
+    max_entries=CONFIG.get('response_cache', {}).get('max_entries', 1024))
+rate_limiters = RateLimiterRegistry(CONFIG.get('rate_limit', {}).get('hosts'))
+retry_policy = RetryPolicy(**CONFIG.get('retry', {}))
+single_flight = SingleFlight()
+
+_pool_manager: Optional[urllib3.PoolManager] = None
+_pool_manager_lock = threading.Lock()
+
+
+def freeze(mapping: Optional[JsonType]) -> Tuple[Tuple[str, str], ...]:
+    """Hashable, order independent form of a params/headers mapping."""
+    return tuple(sorted((str(k), str(v)) for k, v in (mapping or {}).items()))
+
+
+def get_pool_manager() -> urllib3.PoolManager:
+    """Return the process-wide PoolManager, creating it on first use.
+
+    One connection pool is kept per host so that every request handler
+    reuses established TCP/TLS connections instead of opening new ones.
+    """
+    global _pool_manager
+    if _pool_manager is None:
+        with _pool_manager_lock:
+            if _pool_manager is None:
+                socket_options = list(HTTPConnection.default_socket_options)
+                if POOL_CONFIG.get('keep_alive', True):
+                    socket_options.append(
+                        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+                _pool_manager = urllib3.PoolManager(
+                    num_pools=POOL_CONFIG.get('num_pools', 10),
+                    maxsize=POOL_CONFIG.get('maxsize', 10),
+                    block=POOL_CONFIG.get('block', False),
+                    socket_options=socket_options,
+                )
+    return _pool_manager
+
+
+def reset_pool_manager() -> None:
+    """Close every pooled connection and drop the shared PoolManager."""
+    global _pool_manager
+    with _pool_manager_lock:
+        if _pool_manager is not None:
+            _pool_manager.clear()
+        _pool_manager = None
+
+
+def get_pool_stats() -> Dict[str, Dict[str, int]]:
+    """Connections created vs. reused for every host currently pooled."""
+    stats: Dict[str, Dict[str, int]] = {}
+    if _pool_manager is None:
+        return stats
+    for key in list(_pool_manager.pools.keys()):
+        pool = _pool_manager.pools.get(key)
+        if pool is None:
+            continue
+        host = '{}://{}:{}'.format(key.key_scheme, key.key_host, key.key_port)
+        stats[host] = {
+            'requests': pool.num_requests,
+            'connections_created': pool.num_connections,
+            'connections_reused': max(
+                pool.num_requests - pool.num_connections, 0),
+        }
+    return stats
 
 
 class BaseRequestHandler(metaclass=ABCMeta):
@@ -17,22 +96,53 @@ class BaseRequestHandler(metaclass=ABCMeta):
     PARAMS: JsonType = {}
     BODY: JsonType = {}
     METHOD: str = CONFIG['default_method']
+    # when True, constructing the handler only describes the request and
+    # execute() (or a RequestBatch) fires it later.
+    LAZY: bool = False
+    # seconds a parsed GET response is served from RESPONSE_CACHE before
+    # being revalidated; None disables caching for the handler. Entries
+    # are per handler class, and every hit returns the same parsed object,
+    # so callers must treat a cached response as read-only.
+    CACHE_TTL: Optional[float] = None
+    RESPONSE_CACHE: ResponseCache = response_cache
+    RETRY_POLICY: RetryPolicy = retry_policy
+    # concurrent identical requests with these methods share one call
+    COALESCE_METHODS: Tuple[str, ...] = ('GET',)
+    # when True the body is not preloaded and response_handler gets a
+    # streaming response (see helpers.json_stream.stream_array_items).
+    # Streamed responses are never cached or shared between callers.
+    STREAM_RESPONSE: bool = False
+    SINGLE_FLIGHT: SingleFlight = single_flight
 
     @abstractmethod
     def __init__(
+        self, relative_url: str = None,
+        method: str = None,
+        headers: JsonType = None,
+        params: JsonType = None,
+        body: JsonType = None,
+        lazy: bool = None
+    ) -> None:
+        self.response: JsonType = {}
+        self.set_request_attributes(
+            relative_url=relative_url, method=method,
+            headers=headers, params=params, body=body)
+        self.LAZY = lazy if lazy is not None else self.LAZY
+        if not self.LAZY:
+            self.execute()
+
+    def set_request_attributes(
         self, relative_url: str = None,
         method: str = None,
         headers: JsonType = None,
         params: JsonType = None,
         body: JsonType = None
     ) -> None:
-        self.response = {}
         self.relative_url = relative_url if relative_url else None
         self.METHOD = method if method else self.METHOD
         self.PARAMS = params if params else self.PARAMS
         self.HEADERS = headers if headers else self.HEADERS
         self.BODY = body if body else self.BODY
-        self.response = self.fire_request()
 
     @property
     @abstractmethod
@@ -42,6 +152,8 @@ class BaseRequestHandler(metaclass=ABCMeta):
     def get_headers(self) -> JsonType:
         headers = copy.deepcopy(self.HEADERS)
         headers['User-Agent'] = CONFIG['user_agent']
+        if not POOL_CONFIG.get('keep_alive', True):
+            headers['Connection'] = 'close'
         return headers
 
     def get_params(self) -> Tuple[Optional[JsonType], Optional[str]]:
@@ -56,28 +168,113 @@ class BaseRequestHandler(metaclass=ABCMeta):
     def get_body(self) -> Optional[bytes]:
         body = None
         if self.BODY:
-            body = json.dumps(self.BODY).encode('utf-8')
+            body = json_codec.dumps(self.BODY)
         return body
 
-    def fire_request(self) -> JsonType:
-        self.validate_method_type()
-        fields, encoded_params = self.get_params()
-        http = urllib3.PoolManager()
+    def execute(self) -> JsonType:
+        self.response = self.fire_request()
+        return self.response
+
+    def get_url(self, encoded_params: Optional[str] = None) -> str:
         url = (self.base_url + self.relative_url
                if self.relative_url else self.base_url)
         if encoded_params:
             url += '?{}'.format(encoded_params)
-        response = http.request(
-            self.METHOD, url, body=self.get_body(),
-            headers=self.get_headers(), fields=fields, timeout=self.TIMEOUT)
+        return url
+
+    def get_cache_key(
+        self, url: str, fields: Optional[JsonType]
+    ) -> Optional[Hashable]:
+        if (self.CACHE_TTL is None or self.METHOD != 'GET'
+                or self.STREAM_RESPONSE):
+            return None
+        # subclasses may parse the same URL differently
+        return (type(self), self.METHOD, url, freeze(fields),
+                freeze(self.HEADERS))
+
+    def release(self, response) -> None:
+        """Give a discarded streaming response's connection back to the pool."""
+        if self.STREAM_RESPONSE:
+            response.drain_conn()
+            response.release_conn()
+
+    def send_request(
+        self, url: str, headers: JsonType, fields: Optional[JsonType]
+    ):
+        """Send the request through the host's rate limiter, retrying
+        throttled and transient failures according to RETRY_POLICY.
+        """
+        http = get_pool_manager()
+        limiter = rate_limiters.get(parse_url(url).host)
+        body = self.get_body()
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            response = http.request(
+                self.METHOD, url, body=body,
+                headers=headers, fields=fields, timeout=self.TIMEOUT,
+                retries=CONNECTION_RETRIES,
+                preload_content=not self.STREAM_RESPONSE)
+            if not self.RETRY_POLICY.should_retry(attempt, response.status):
+                return response
+            self.release(response)
+            self.RETRY_POLICY.wait(attempt, response.headers.get('Retry-After'))
+            attempt += 1
+
+    def get_request_key(
+        self, url: str, fields: Optional[JsonType]
+    ) -> Optional[Hashable]:
+        if self.METHOD not in self.COALESCE_METHODS or self.STREAM_RESPONSE:
+            return None
+        # handlers parsing the same URL differently must not share a result
+        return (
+            type(self), self.METHOD, url, freeze(fields), freeze(self.HEADERS),
+            self.get_body(),
+        )
+
+    def fire_request(self) -> JsonType:
+        self.validate_method_type()
+        fields, encoded_params = self.get_params()
+        url = self.get_url(encoded_params)
+        key = self.get_request_key(url, fields)
+        if key is None:
+            return self.load_response(url, fields)
+        return self.SINGLE_FLIGHT.do(
+            key, lambda: self.load_response(url, fields))
+
+    def load_response(self, url: str, fields: Optional[JsonType]) -> JsonType:
+        headers = self.get_headers()
+        cache_key = self.get_cache_key(url, fields)
+        stale = None
+        if cache_key is not None:
+            cached = self.RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                return cached.data
+            stale = self.RESPONSE_CACHE.get_stale(cache_key)
+            if stale is not None:
+                self.RESPONSE_CACHE.revalidations += 1
+                headers.update(stale.conditional_headers())
+        response = self.send_request(url, headers, fields)
+        if response.status == 304 and stale is not None:
+            self.RESPONSE_CACHE.refresh(cache_key, stale, self.CACHE_TTL)
+            return stale.data
         if response.status > 400:
-            raise Exception
-        return self.response_handler(response)
+            self.release(response)
+            raise errors.UpstreamRequestException(response.status, url)
+        data = self.response_handler(response)
+        if cache_key is not None:
+            self.RESPONSE_CACHE.store(cache_key, data, response, self.CACHE_TTL)
+        return data
 
     def validate_method_type(self) -> None:
         if self.METHOD not in self.ALLOWED_REQUEST_TYPES:
             raise ValueError
 
+    @staticmethod
+    def parse_json(response) -> JsonType:
+        return json_codec.loads(response.data)
+
     @abstractmethod
     def response_handler(self, response) -> JsonType:
         pass
@@ -0,0 +1,71 @@
+"""JSON encoding shared by request bodies, responses and CRUD writes.
+
+orjson is used when it is installed and the standard library otherwise.
+Both backends take and return bytes. Only orjson works on them directly;
+the standard library fallback encodes to a `str` and decodes through one
+internally, so it still pays for that intermediate copy.
+"""
+import datetime
+import decimal
+import enum
+import json
+import uuid
+from typing import Any, Union
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover - depends on the environment
+    HAS_ORJSON = False
+
+BACKEND = 'orjson' if HAS_ORJSON else 'json'
+
+
+def default(obj: Any) -> Any:
+    """Fallback for types neither backend serializes natively."""
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, '_sa_instance_state'):
+        # loaded attributes of a SQLAlchemy model, like jsonable_encoder
+        return {key: value for key, value in vars(obj).items()
+                if not key.startswith('_sa')}
+    raise TypeError('Object of type {} is not JSON serializable'.format(
+        type(obj).__name__))
+
+
+if HAS_ORJSON:
+    def dumps(obj: Any) -> bytes:
+        # json.dumps accepts int (and other scalar) keys, callers rely on it
+        return orjson.dumps(
+            obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        return orjson.loads(data)
+else:  # pragma: no cover - depends on the environment
+    _encoder = json.JSONEncoder(
+        default=default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+def to_builtins(obj: Any) -> Any:
+    """Convert `obj` to plain JSON types, like fastapi's jsonable_encoder."""
+    return loads(dumps(obj))
@@ -0,0 +1,104 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Tuple
+
+from custom_types import JsonType
+
+WHITESPACE = ' \t\n\r'
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """Yield the items of the array stored under `key` as they arrive.
+
+    Only the item being decoded is held in memory, so the peak footprint
+    is bounded by the largest item rather than by the whole payload. The
+    first occurrence of `"key"` followed by `:` and `[` is taken as the
+    array, which holds for the top-level `centers`/`sessions` arrays of
+    the CoWIN responses.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunk_iter = iter(chunks)
+    buffer = ''
+    eof = False
+
+    def read() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        chunk = next(chunk_iter, None)
+        if chunk is None:
+            eof = True
+            buffer += text_decoder.decode(b'', final=True)
+            return False
+        buffer += text_decoder.decode(chunk)
+        return True
+
+    marker = '"{}"'.format(key)
+    pos = -1
+    while pos < 0:
+        pos = buffer.find(marker)
+        if pos < 0:
+            # keep a tail in case the marker is split across chunks
+            buffer = buffer[-len(marker):]
+            if not read():
+                return
+    pos += len(marker)
+
+    for expected in ':[':
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                break
+            if not read():
+                raise ValueError('Unexpected end of JSON stream')
+        if buffer[pos] != expected:
+            raise ValueError('"{}" is not a JSON array'.format(key))
+        pos += 1
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in WHITESPACE + ',':
+            pos += 1
+        if pos == len(buffer):
+            if not read():
+                raise ValueError('Unexpected end of JSON stream')
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if not read():
+                raise
+            continue
+        if end == len(buffer) and read():
+            # a scalar cut at a chunk boundary, decode it again in full
+            continue
+        yield item
+        buffer, pos = buffer[end:], 0
+
+
+def stream_array_items(
+    response, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Any]:
+    """Stream `key` items out of a urllib3 response built with
+    `preload_content=False`, returning the connection to the pool once
+    the generator is exhausted or closed.
+    """
+    try:
+        yield from iter_array_items(
+            response.stream(chunk_size, decode_content=True), key)
+    finally:
+        response.drain_conn()
+        response.release_conn()
+
+
+def iter_center_sessions(
+    centers: Iterable[JsonType]
+) -> Iterator[Tuple[JsonType, JsonType]]:
+    """Flatten calendar centers into (center, session) pairs."""
+    for center in centers:
+        for session in center.get('sessions', []):
+            yield center, session
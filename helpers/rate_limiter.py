@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """Token bucket shared by every thread and asyncio task of a process.
+
+    `reserve` takes tokens up front (the balance may go negative) and
+    returns how long the caller has to wait for them, so waiters queue up
+    in arrival order and nobody spins on the lock.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, capacity: float = None) -> None:
+        """Change the rate in place, keeping the tokens already earned up to
+        the new capacity.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.capacity = capacity if capacity is not None else max(rate, 1)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self._lock:
+            self._refill()
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+            return wait
+
+    def acquire(self, tokens: float = 1) -> None:
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class RateLimiterRegistry:
+    """One TokenBucket per host, built from the `rate_limit.hosts` config.
+
+    Hosts without a configured rate are not limited. When several
+    processes call the same hosts, each one gets a `share` of the
+    configured rates and bursts.
+    """
+
+    def __init__(
+        self, hosts: Dict[str, Dict[str, float]] = None, share: float = 1.0
+    ) -> None:
+        self.hosts = hosts or {}
+        self.share = share
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _limits(self, host: str) -> Tuple[float, Optional[float]]:
+        config = self.hosts[host]
+        capacity = config.get('capacity')
+        return (config['rate'] * self.share,
+                None if capacity is None else max(capacity * self.share, 1))
+
+    def set_share(self, share: float) -> None:
+        with self._lock:
+            self.share = share
+            for host, bucket in self._buckets.items():
+                bucket.configure(*self._limits(host))
+
+    def get(self, host: Optional[str]) -> Optional[TokenBucket]:
+        if host is None or host not in self.hosts:
+            return None
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    rate, capacity = self._limits(host)
+                    bucket = TokenBucket(rate, capacity=capacity)
+                    self._buckets[host] = bucket
+        return bucket
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional
+
+from custom_types import JsonType
+from helpers.base_request_handler import BaseRequestHandler, CONFIG
+
+BATCH_CONFIG = CONFIG.get('batch', {})
+
+
+class BatchResult(NamedTuple):
+    handler: BaseRequestHandler
+    response: Optional[JsonType]
+    error: Optional[BaseException]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class RequestBatch:
+    """Run lazily built request handlers across a pool of worker threads.
+
+    Handlers should be constructed with `lazy=True` (or have LAZY set on
+    the class) so that building them does not fire the request. Results
+    come back in the order the handlers were added, and a failing request
+    is reported in its BatchResult instead of aborting the whole batch.
+    """
+
+    def __init__(
+        self,
+        handlers: Iterable[BaseRequestHandler] = None,
+        max_workers: int = None
+    ) -> None:
+        self.handlers: List[BaseRequestHandler] = list(handlers or [])
+        self.max_workers = max_workers or BATCH_CONFIG.get('max_workers', 16)
+
+    def add(self, handler: BaseRequestHandler) -> None:
+        self.handlers.append(handler)
+
+    def __len__(self) -> int:
+        return len(self.handlers)
+
+    @staticmethod
+    def run_one(handler: BaseRequestHandler) -> BatchResult:
+        try:
+            return BatchResult(handler, handler.execute(), None)
+        except Exception as e:
+            return BatchResult(handler, None, e)
+
+    def run(self) -> List[BatchResult]:
+        if not self.handlers:
+            return []
+        workers = min(self.max_workers, len(self.handlers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.run_one, self.handlers))
@@ -0,0 +1,60 @@
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from custom_types import JsonType
+from helpers.ttl_cache import TTLCache
+
+
+class CachedResponse(NamedTuple):
+    data: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    def conditional_headers(self) -> JsonType:
+        headers: JsonType = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Parsed responses keyed on the request, with ETag/Last-Modified
+    revalidation once an entry's TTL runs out.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.entries = TTLCache(max_entries=max_entries)
+        self.revalidations = 0
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self.entries.get(key)
+
+    def get_stale(self, key: Hashable) -> Optional[CachedResponse]:
+        return self.entries.get_stale(key)
+
+    def store(
+        self, key: Hashable, data: Any, response, ttl: Optional[float] = None
+    ) -> None:
+        self.entries.set(key, CachedResponse(
+            data=data,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        ), ttl=ttl)
+
+    def refresh(
+        self, key: Hashable, cached: CachedResponse, ttl: Optional[float] = None
+    ) -> None:
+        """Extend the life of `cached` after the server answered 304."""
+        self.not_modified += 1
+        self.entries.set(key, cached, ttl=ttl)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        stats = self.entries.stats()
+        stats['revalidations'] = self.revalidations
+        stats['not_modified'] = self.not_modified
+        return stats
@@ -0,0 +1,60 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter that honours `Retry-After`.
+
+    The n-th retry waits a random time in [0, backoff_factor * 2 ** n],
+    capped at max_backoff. A `Retry-After` header sent by the server
+    replaces the computed delay, but is capped at max_backoff as well so a
+    server asking for an hour cannot park a pool thread that long.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30,
+        statuses: Iterable[int] = (429, 500, 502, 503, 504),
+        rand: Callable[[], float] = random.random,
+        sleep: Callable[[float], None] = time.sleep
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.rand = rand
+        self.sleep = sleep
+
+    def should_retry(self, attempt: int, status: int) -> bool:
+        return attempt < self.max_retries and status in self.statuses
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+    def get_backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        server_delay = self.parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, self.max_backoff)
+        ceiling = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        return self.rand() * ceiling
+
+    def wait(self, attempt: int, retry_after: Optional[str] = None) -> None:
+        self.sleep(self.get_backoff(attempt, retry_after))
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while
+    it is in flight wait and receive the same result (or exception).
+    Nothing is remembered once the call finishes.
+    """
+
+    def __init__(self) -> None:
+        self.executed = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._futures: Dict[Tuple[int, Hashable], 'asyncio.Future[Any]'] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            existing = self._calls.get(key)
+            leader = existing is None
+            if existing is None:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call = existing
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        future = self._futures.get(flight_key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        future = self._futures[flight_key] = loop.create_future()
+        self.executed += 1
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._futures[flight_key]
+
+    def stats(self):
+        return {'executed': self.executed, 'coalesced': self.coalesced}
@@ -0,0 +1,256 @@
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from crud.alert_config import alert_config
+from crud.base import CRUDListener
+from custom_types import JsonType
+from matcher.predicates import CompiledAlertConfig, Condition, PredicateCompiler
+from models.alert_config import AlertConfig
+from models.filters import ConfiguredFilter, Evaluators, Filters
+
+REBUILD_CHUNK_SIZE = 1000
+
+
+class DistrictIndex:
+    """Candidate lookup for the configs of a single district.
+
+    Each config is indexed on at most one condition per filter dimension;
+    configs without a condition on a dimension sit in that dimension's
+    `any` set. A lookup intersects, per dimension, the configs whose
+    indexed condition accepts the session with the `any` set, so it only
+    returns a superset of the matches that the compiled predicates then
+    confirm.
+    """
+
+    def __init__(self) -> None:
+        self.config_ids: Set[int] = set()
+        self.vaccine: Dict[str, Set[int]] = {}
+        self.vaccine_any: Set[int] = set()
+        self.age_exact: Dict[int, Set[int]] = {}
+        # (threshold, config_id), sorted; session age > / < threshold
+        self.age_above: List[Tuple[int, int]] = []
+        self.age_below: List[Tuple[int, int]] = []
+        self.age_any: Set[int] = set()
+        self.dose: Dict[int, Set[int]] = {}
+        self.dose_any: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.config_ids)
+
+    @staticmethod
+    def first(
+        compiled: CompiledAlertConfig, filter_: Filters
+    ) -> Optional[Condition]:
+        for condition in compiled.conditions:
+            if condition.filter == filter_:
+                return condition
+        return None
+
+    @staticmethod
+    def values(condition: Condition) -> Iterable:
+        if condition.evaluator == Evaluators.In:
+            return condition.value
+        return (condition.value,)
+
+    def add(self, compiled: CompiledAlertConfig) -> None:
+        _id = compiled.id
+        self.config_ids.add(_id)
+
+        vaccine = self.first(compiled, Filters.Vaccine)
+        if vaccine is None:
+            self.vaccine_any.add(_id)
+        else:
+            for value in self.values(vaccine):
+                self.vaccine.setdefault(value, set()).add(_id)
+
+        age = self.first(compiled, Filters.Age)
+        if age is None:
+            self.age_any.add(_id)
+        elif age.evaluator == Evaluators.GreaterThan:
+            bisect.insort(self.age_above, (age.value, _id))
+        elif age.evaluator == Evaluators.LessThan:
+            bisect.insort(self.age_below, (age.value, _id))
+        else:
+            for value in self.values(age):
+                self.age_exact.setdefault(value, set()).add(_id)
+
+        dose = self.first(compiled, Filters.Dose)
+        if dose is None:
+            self.dose_any.add(_id)
+        else:
+            for value in dose.allowed_doses():
+                self.dose.setdefault(value, set()).add(_id)
+
+    def remove(self, compiled: CompiledAlertConfig) -> None:
+        _id = compiled.id
+        self.config_ids.discard(_id)
+        for ids in (self.vaccine_any, self.age_any, self.dose_any):
+            ids.discard(_id)
+        indexes: Tuple[Dict[Any, Set[int]], ...] = (
+            self.vaccine, self.age_exact, self.dose)
+        for index in indexes:
+            for key in [k for k, ids in index.items() if _id in ids]:
+                index[key].discard(_id)
+                if not index[key]:
+                    del index[key]
+        age = self.first(compiled, Filters.Age)
+        if age is not None and age.evaluator in (
+                Evaluators.GreaterThan, Evaluators.LessThan):
+            ordered = (self.age_above if age.evaluator == Evaluators.GreaterThan
+                       else self.age_below)
+            position = bisect.bisect_left(ordered, (age.value, _id))
+            if position < len(ordered) and ordered[position] == (age.value, _id):
+                del ordered[position]
+
+    def candidates(self, session: JsonType) -> Set[int]:
+        vaccine = (session.get('vaccine') or '').upper()
+        by_vaccine = self.vaccine.get(vaccine, set()) | self.vaccine_any
+
+        age = session.get('min_age_limit')
+        by_age = set(self.age_any)
+        if age is not None:
+            by_age |= self.age_exact.get(age, set())
+            above = bisect.bisect_left(self.age_above, (age, -1))
+            by_age.update(_id for _, _id in self.age_above[:above])
+            below = bisect.bisect_right(self.age_below, (age, float('inf')))
+            by_age.update(_id for _, _id in self.age_below[below:])
+
+        by_dose = set(self.dose_any)
+        if (session.get('available_capacity_dose1') or 0) > 0:
+            by_dose |= self.dose.get(1, set())
+        if (session.get('available_capacity_dose2') or 0) > 0:
+            by_dose |= self.dose.get(2, set())
+
+        dimensions = sorted((by_vaccine, by_age, by_dose), key=len)
+        return dimensions[0].intersection(*dimensions[1:])
+
+
+class AlertConfigIndex:
+    """In-memory inverted index from session attributes to AlertConfigs,
+    partitioned by district.
+    """
+
+    def __init__(self, compiler: PredicateCompiler = None) -> None:
+        self.compiler = compiler or PredicateCompiler()
+        self.districts: Dict[Optional[int], DistrictIndex] = {}
+        self.configs: Dict[int, CompiledAlertConfig] = {}
+        self.filter_owners: Dict[int, int] = {}
+        self.config_filters: Dict[int, Tuple[int, ...]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.configs)
+
+    def add(self, config: AlertConfig) -> None:
+        """Index (or re-index) `config` together with its filters."""
+        compiled = self.compiler.compile(config)
+        with self._lock:
+            self.remove(config.id)
+            self.configs[compiled.id] = compiled
+            self.districts.setdefault(
+                compiled.district_id, DistrictIndex()).add(compiled)
+            filter_ids = tuple(f.id for f in config.configured_filters)
+            self.config_filters[config.id] = filter_ids
+            for filter_id in filter_ids:
+                self.filter_owners[filter_id] = config.id
+
+    def remove(self, config_id: int) -> None:
+        with self._lock:
+            compiled = self.configs.pop(config_id, None)
+            if compiled is None:
+                return
+            district = self.districts[compiled.district_id]
+            district.remove(compiled)
+            if not len(district):
+                del self.districts[compiled.district_id]
+            for filter_id in self.config_filters.pop(config_id, ()):
+                self.filter_owners.pop(filter_id, None)
+
+    def candidates(self, district_id: int, session: JsonType) -> Set[int]:
+        district = self.districts.get(district_id)
+        return district.candidates(session) if district is not None else set()
+
+    def match(self, district_id: int, session: JsonType) -> List[int]:
+        """Ids of the configs of `district_id` whose filters all accept
+        `session`.
+        """
+        return sorted(
+            _id for _id in self.candidates(district_id, session)
+            if self.configs[_id](session))
+
+    def refresh(self, db: Session, config_ids: Iterable[int]) -> None:
+        """Reload `config_ids` from the database and re-index them."""
+        config_ids = list(config_ids)
+        for config_id in config_ids:
+            self.compiler.invalidate(config_id)
+        configs = (
+            db.query(AlertConfig)
+            .options(selectinload(AlertConfig.configured_filters))
+            .filter(AlertConfig.id.in_(config_ids))
+            .populate_existing()
+            .all()
+        )
+        found = set()
+        for config in configs:
+            self.add(config)
+            found.add(config.id)
+        for config_id in set(config_ids) - found:
+            self.remove(config_id)
+
+    def rebuild(self, db: Session, chunk_size: int = REBUILD_CHUNK_SIZE) -> None:
+        """Replace the index with every AlertConfig in the database.
+
+        Rows are read in id order, `chunk_size` configs (plus one query
+        for their filters) at a time, so memory stays bounded by the index
+        itself. The compiled predicates are dropped as well, so none are
+        kept for configs that no longer exist.
+        """
+        with self._lock:
+            self.compiler.clear()
+            self.districts.clear()
+            self.configs.clear()
+            self.filter_owners.clear()
+            self.config_filters.clear()
+            last_id = 0
+            while True:
+                chunk = alert_config.get_multi(
+                    db, limit=chunk_size, after_id=last_id, options='filters')
+                for config in chunk:
+                    self.add(config)
+                if len(chunk) < chunk_size:
+                    break
+                last_id = chunk[-1].id
+
+
+class AlertConfigIndexListener(CRUDListener):
+    """Keeps an AlertConfigIndex in sync with the AlertConfig CRUD object."""
+
+    def __init__(self, index: AlertConfigIndex) -> None:
+        self.index = index
+
+    def after_write(self, db: Session, ids: List[int]) -> None:
+        self.index.refresh(db, ids)
+
+    def after_remove(self, db: Session, ids: List[int]) -> None:
+        for _id in ids:
+            self.index.remove(_id)
+
+
+class ConfiguredFilterIndexListener(CRUDListener):
+    """Re-indexes the owning AlertConfigs when their filters change."""
+
+    def __init__(self, index: AlertConfigIndex) -> None:
+        self.index = index
+
+    def after_write(self, db: Session, ids: List[int]) -> None:
+        owners = db.query(ConfiguredFilter.alert_config_id).filter(
+            ConfiguredFilter.id.in_(ids)).distinct()
+        self.index.refresh(db, [owner for owner, in owners if owner is not None])
+
+    def after_remove(self, db: Session, ids: List[int]) -> None:
+        owners = {self.index.filter_owners[_id] for _id in ids
+                  if _id in self.index.filter_owners}
+        self.index.refresh(db, owners)
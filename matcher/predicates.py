@@ -0,0 +1,182 @@
+import operator
+import threading
+from datetime import datetime
+from typing import (
+    Any, Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple)
+
+import errors
+from custom_types import JsonType
+from models.alert_config import AlertConfig
+from models.filters import ConfiguredFilter, Evaluators, Filters
+
+DOSES = (1, 2)
+DOSE_CAPACITY_KEYS = {
+    1: 'available_capacity_dose1',
+    2: 'available_capacity_dose2',
+}
+COMPARATORS: Dict[Evaluators, Callable[[Any, Any], bool]] = {
+    Evaluators.Equals: operator.eq,
+    Evaluators.GreaterThan: operator.gt,
+    Evaluators.LessThan: operator.lt,
+    Evaluators.In: lambda actual, values: actual in values,
+}
+ALLOWED_EVALUATORS = {
+    Filters.Vaccine: {Evaluators.Equals, Evaluators.In},
+    Filters.Age: set(Evaluators),
+    Filters.Dose: set(Evaluators),
+}
+
+
+def parse_scalar(filter_: Filters, raw: str) -> Any:
+    raw = raw.strip()
+    if filter_ == Filters.Vaccine:
+        return raw.upper()
+    try:
+        value = int(raw)
+    except ValueError:
+        raise errors.InvalidInputException(
+            '{} expects an integer, got {!r}'.format(filter_.name, raw))
+    if filter_ == Filters.Dose and value not in DOSES:
+        raise errors.InvalidInputException('Unknown dose {}'.format(value))
+    return value
+
+
+def parse_value(filter_: Filters, evaluator: Evaluators, raw: str) -> Any:
+    """Parse the stored string once: `In` becomes a frozenset of values,
+    every other evaluator a single int or upper-cased vaccine name.
+    """
+    if evaluator not in ALLOWED_EVALUATORS[filter_]:
+        raise errors.InvalidInputException('{} does not support {}'.format(
+            filter_.name, evaluator.value))
+    if evaluator == Evaluators.In:
+        return frozenset(
+            parse_scalar(filter_, part) for part in raw.split(',') if part.strip())
+    return parse_scalar(filter_, raw)
+
+
+class Condition(NamedTuple):
+    filter: Filters
+    evaluator: Evaluators
+    value: Any
+
+    @classmethod
+    def from_filter(cls, configured_filter: ConfiguredFilter) -> 'Condition':
+        return cls(
+            configured_filter.filter, configured_filter.evaluator,
+            parse_value(configured_filter.filter, configured_filter.evaluator,
+                        configured_filter.value))
+
+    def allowed_doses(self) -> FrozenSet[int]:
+        """Doses that satisfy a Dose condition."""
+        compare = COMPARATORS[self.evaluator]
+        return frozenset(d for d in DOSES if compare(d, self.value))
+
+    def compile(self) -> Callable[[JsonType], bool]:
+        compare = COMPARATORS[self.evaluator]
+        value = self.value
+        if self.filter == Filters.Vaccine:
+            return lambda session: compare(
+                (session.get('vaccine') or '').upper(), value)
+        if self.filter == Filters.Age:
+            # a missing age limit counts as 0, as in the vectorized matcher
+            return lambda session: compare(
+                session.get('min_age_limit') or 0, value)
+        keys = tuple(DOSE_CAPACITY_KEYS[d] for d in self.allowed_doses())
+        # a dose filter matches when a wanted dose still has capacity
+        return lambda session: any((session.get(key) or 0) > 0 for key in keys)
+
+
+class CompiledAlertConfig:
+    """An AlertConfig with its filters parsed into one session predicate.
+
+    Filters are combined with AND; a config without filters matches every
+    session.
+    """
+    __slots__ = ('id', 'district_id', 'updated_at', 'conditions', '_checks')
+
+    def __init__(
+        self,
+        _id: int,
+        district_id: Optional[int],
+        updated_at: Optional[datetime],
+        conditions: Iterable[Condition]
+    ) -> None:
+        self.id = _id
+        self.district_id = district_id
+        self.updated_at = updated_at
+        self.conditions: Tuple[Condition, ...] = tuple(conditions)
+        self._checks = tuple(c.compile() for c in self.conditions)
+
+    @classmethod
+    def from_config(cls, config: AlertConfig) -> 'CompiledAlertConfig':
+        return cls(
+            config.id, config.district_id, config.updated_at,
+            (Condition.from_filter(f) for f in config.configured_filters))
+
+    def __call__(self, session: JsonType) -> bool:
+        for check in self._checks:
+            if not check(session):
+                return False
+        return True
+
+    matches = __call__
+
+
+ConfigVersion = Tuple[Optional[datetime], Tuple[Tuple[Any, ...], ...]]
+
+
+def config_version(config: AlertConfig) -> ConfigVersion:
+    """What a compiled config depends on. Editing a ConfiguredFilter does
+    not touch `AlertConfig.updated_at` (which only has one second
+    resolution on SQLite anyway), so the filters themselves are part of it.
+    """
+    return config.updated_at, tuple(
+        (f.id, f.filter, f.evaluator, f.value)
+        for f in config.configured_filters)
+
+
+class PredicateCompiler:
+    """Compile AlertConfigs once and reuse them until the config or any of
+    its filters change.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._compiled: Dict[int, CompiledAlertConfig] = {}
+        self._versions: Dict[int, ConfigVersion] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def compile(self, config: AlertConfig) -> CompiledAlertConfig:
+        version = config_version(config)
+        compiled = self._compiled.get(config.id)
+        if compiled is not None and self._versions.get(config.id) == version:
+            self.hits += 1
+            return compiled
+        self.misses += 1
+        compiled = CompiledAlertConfig.from_config(config)
+        with self._lock:
+            self._compiled[config.id] = compiled
+            self._versions[config.id] = version
+        return compiled
+
+    def compile_all(
+        self, configs: Iterable[AlertConfig]
+    ) -> Tuple[CompiledAlertConfig, ...]:
+        return tuple(self.compile(config) for config in configs)
+
+    def get(self, config_id: int) -> Optional[CompiledAlertConfig]:
+        return self._compiled.get(config_id)
+
+    def invalidate(self, config_id: int) -> None:
+        with self._lock:
+            self._compiled.pop(config_id, None)
+            self._versions.pop(config_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._compiled.clear()
+            self._versions.clear()
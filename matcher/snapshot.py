@@ -0,0 +1,120 @@
+import enum
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from custom_types import JsonType
+from helpers.json_stream import iter_center_sessions
+
+
+class DeltaKind(enum.Enum):
+    New = 'new'
+    CapacityIncreased = 'capacity_increased'
+    CapacityExhausted = 'capacity_exhausted'
+
+
+class SessionDelta(NamedTuple):
+    kind: DeltaKind
+    center: JsonType
+    session: JsonType
+    previous_capacity: int
+
+    @property
+    def triggers_alert(self) -> bool:
+        """Only new or grown availability is worth matching and notifying."""
+        return self.kind != DeltaKind.CapacityExhausted
+
+
+def capacity(session: JsonType) -> int:
+    return session.get('available_capacity') or 0
+
+
+def fingerprint(center: JsonType, session: JsonType) -> int:
+    """Compact hash of everything in a session a subscriber could see."""
+    return hash((
+        center.get('center_id'), center.get('fee_type'),
+        session.get('date'), session.get('vaccine'),
+        session.get('min_age_limit'), capacity(session),
+        session.get('available_capacity_dose1'),
+        session.get('available_capacity_dose2'),
+        tuple(session.get('slots') or ()),
+    ))
+
+
+class SnapshotStore:
+    """Last seen state of every session, per district.
+
+    Each session is kept as a (fingerprint, capacity) pair, so the store
+    stays small however large the calendar responses are. `diff` compares
+    a new poll with the snapshot, replaces the snapshot and returns only
+    the sessions whose availability changed in a way subscribers care
+    about. Sessions without a `session_id` cannot be told apart between
+    polls, so they are skipped and only counted.
+    """
+
+    def __init__(self) -> None:
+        self.sessions_seen = 0
+        self.sessions_skipped = 0
+        self.deltas_emitted = 0
+        self._snapshots: Dict[int, Dict[str, Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def get(self, district_id: int) -> Optional[Dict[str, Tuple[int, int]]]:
+        return self._snapshots.get(district_id)
+
+    def diff(
+        self, district_id: int, centers: Iterable[JsonType]
+    ) -> List[SessionDelta]:
+        with self._lock:
+            previous = self._snapshots.get(district_id, {})
+        current: Dict[str, Tuple[int, int]] = {}
+        deltas: List[SessionDelta] = []
+        skipped = 0
+        for center, session in iter_center_sessions(centers):
+            session_id = session.get('session_id')
+            if session_id is None:
+                skipped += 1
+                continue
+            state = (fingerprint(center, session), capacity(session))
+            current[session_id] = state
+            seen = previous.get(session_id)
+            if seen is not None and seen[0] == state[0]:
+                continue
+            seen_capacity = seen[1] if seen is not None else 0
+            kind = None
+            if seen is None:
+                if state[1] > 0:
+                    kind = DeltaKind.New
+            elif state[1] > seen_capacity:
+                kind = DeltaKind.CapacityIncreased
+            elif state[1] == 0 and seen_capacity > 0:
+                kind = DeltaKind.CapacityExhausted
+            if kind is not None:
+                deltas.append(SessionDelta(kind, center, session, seen_capacity))
+        with self._lock:
+            self._snapshots[district_id] = current
+            self.sessions_seen += len(current)
+            self.sessions_skipped += skipped
+            self.deltas_emitted += len(deltas)
+        return deltas
+
+    def forget(self, district_id: int) -> None:
+        with self._lock:
+            self._snapshots.pop(district_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'districts': len(self._snapshots),
+            'sessions_seen': self.sessions_seen,
+            'sessions_skipped': self.sessions_skipped,
+            'deltas_emitted': self.deltas_emitted,
+            'delta_ratio': (self.deltas_emitted / self.sessions_seen
+                            if self.sessions_seen else 0.0),
+        }
+
+
+def alerting_sessions(deltas: Iterable[SessionDelta]) -> List[JsonType]:
+    """The sessions of `deltas` that should feed filter matching."""
+    return [delta.session for delta in deltas if delta.triggers_alert]
@@ -0,0 +1,160 @@
+from datetime import datetime
+from typing import (
+    Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional,
+    Sequence)
+
+import numpy as np
+
+from custom_types import JsonType
+from matcher.predicates import CompiledAlertConfig, Condition
+from models.filters import Evaluators, Filters
+
+DATE_FORMAT = '%d-%m-%Y'
+UNKNOWN_VACCINE = -1
+
+COMPARE = {
+    Evaluators.Equals: np.equal,
+    Evaluators.GreaterThan: np.greater,
+    Evaluators.LessThan: np.less,
+}
+
+
+def parse_date(value: Optional[str]) -> np.datetime64:
+    if not value:
+        return np.datetime64('NaT')
+    return np.datetime64(datetime.strptime(value, DATE_FORMAT).date(), 'D')
+
+
+class SessionColumns:
+    """One poll's sessions laid out as column arrays.
+
+    Vaccine names are stored as small integer codes; `vaccine_codes` maps
+    the upper-cased name to its code.
+    """
+
+    def __init__(
+        self,
+        min_age: np.ndarray,
+        dose1: np.ndarray,
+        dose2: np.ndarray,
+        vaccine: np.ndarray,
+        date: np.ndarray,
+        vaccine_codes: Dict[str, int]
+    ) -> None:
+        self.min_age = min_age
+        self.dose1 = dose1
+        self.dose2 = dose2
+        self.vaccine = vaccine
+        self.date = date
+        self.vaccine_codes = vaccine_codes
+
+    def __len__(self) -> int:
+        return len(self.min_age)
+
+    @classmethod
+    def from_sessions(cls, sessions: Sequence[JsonType]) -> 'SessionColumns':
+        vaccine_codes: Dict[str, int] = {}
+        vaccine = np.empty(len(sessions), dtype=np.int16)
+        for i, session in enumerate(sessions):
+            name = (session.get('vaccine') or '').upper()
+            vaccine[i] = vaccine_codes.setdefault(name, len(vaccine_codes))
+        return cls(
+            min_age=np.fromiter(
+                (s.get('min_age_limit') or 0 for s in sessions),
+                dtype=np.int16, count=len(sessions)),
+            dose1=np.fromiter(
+                (s.get('available_capacity_dose1') or 0 for s in sessions),
+                dtype=np.int32, count=len(sessions)),
+            dose2=np.fromiter(
+                (s.get('available_capacity_dose2') or 0 for s in sessions),
+                dtype=np.int32, count=len(sessions)),
+            vaccine=vaccine,
+            date=np.array(
+                [parse_date(s.get('date')) for s in sessions],
+                dtype='datetime64[D]'),
+            vaccine_codes=vaccine_codes,
+        )
+
+    def code(self, vaccine: str) -> int:
+        return self.vaccine_codes.get(vaccine, UNKNOWN_VACCINE)
+
+    def mask(self, condition: Condition) -> np.ndarray:
+        """Boolean mask of the sessions that satisfy `condition`."""
+        if condition.filter == Filters.Dose:
+            mask = np.zeros(len(self), dtype=bool)
+            doses = condition.allowed_doses()
+            if 1 in doses:
+                mask |= self.dose1 > 0
+            if 2 in doses:
+                mask |= self.dose2 > 0
+            return mask
+        # a code or list of codes, or an age or list of ages
+        value: Any
+        if condition.filter == Filters.Vaccine:
+            column = self.vaccine
+            value = ([self.code(v) for v in condition.value]
+                     if condition.evaluator == Evaluators.In
+                     else self.code(condition.value))
+        else:
+            column, value = self.min_age, condition.value
+            if condition.evaluator == Evaluators.In:
+                value = list(value)
+        if condition.evaluator == Evaluators.In:
+            return np.isin(column, value)
+        return COMPARE[condition.evaluator](column, value)
+
+
+class MatchGroup(NamedTuple):
+    """Configs sharing the same filters and the sessions they all match."""
+    config_ids: np.ndarray
+    session_indices: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.config_ids) * len(self.session_indices)
+
+
+class BatchMatcher:
+    """Match every (config, session) pair of a poll with vectorized masks.
+
+    Configs are grouped by their set of conditions, each distinct
+    condition is evaluated once over all sessions, and each group costs
+    one AND of its condition masks. The work therefore scales with the
+    number of distinct filter combinations rather than configs x sessions.
+    """
+
+    def __init__(self, configs: Iterable[CompiledAlertConfig]) -> None:
+        groups: Dict[FrozenSet[Condition], List[int]] = {}
+        for config in configs:
+            groups.setdefault(frozenset(config.conditions), []).append(config.id)
+        self.groups = {
+            signature: np.array(ids, dtype=np.int64)
+            for signature, ids in groups.items()
+        }
+
+    def match_groups(self, columns: SessionColumns) -> Iterator[MatchGroup]:
+        masks: Dict[Condition, np.ndarray] = {}
+        everything = np.ones(len(columns), dtype=bool)
+        for signature, config_ids in self.groups.items():
+            mask = everything
+            for condition in signature:
+                condition_mask = masks.get(condition)
+                if condition_mask is None:
+                    condition_mask = masks[condition] = columns.mask(condition)
+                mask = mask & condition_mask
+            session_indices = np.flatnonzero(mask)
+            if len(session_indices):
+                yield MatchGroup(config_ids, session_indices)
+
+    def match(self, columns: SessionColumns) -> np.ndarray:
+        """(config_id, session_index) rows of every match, as an (n, 2) array."""
+        pairs = [
+            np.column_stack((
+                np.repeat(group.config_ids, len(group.session_indices)),
+                np.tile(group.session_indices, len(group.config_ids)),
+            ))
+            for group in self.match_groups(columns)
+        ]
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.concatenate(pairs)
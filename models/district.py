@@ -5,8 +5,11 @@ from db.base import Base
 
 
 class District(Base):
+    # CoWIN's id, used to upsert reference data
+    __natural_key__ = ('external_id',)
+
     state_id = Column(Integer, ForeignKey('state.id'))
     name = Column(String, nullable=False)
-    external_id = Column(Integer, nullable=False)
+    external_id = Column(Integer, nullable=False, unique=True, index=True)
     state = relationship('State', back_populates="districts")
     alert_configs = relationship("AlertConfig", back_populates="district")
@@ -5,6 +5,9 @@ from db.base import Base
 
 
 class State(Base):
+    # CoWIN's id, used to upsert reference data
+    __natural_key__ = ('external_id',)
+
     name = Column(String, nullable=False)
-    external_id = Column(Integer, nullable=False)
+    external_id = Column(Integer, nullable=False, unique=True, index=True)
     districts = relationship("District", back_populates="state")
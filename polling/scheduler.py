@@ -0,0 +1,273 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import (
+    Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple)
+
+from config import APP
+from custom_types import JsonType
+from helpers.rate_limiter import TokenBucket
+from matcher.snapshot import SnapshotStore
+
+CONFIG = APP.get('scheduler', {})
+# polls that the upstream host limiter would not let through only queue up
+# behind it, so the cap defaults to that host's configured rate
+UPSTREAM_RATE_LIMIT = (
+    APP.get('base_request_handler', {}).get('rate_limit', {}).get('hosts', {})
+    .get(CONFIG.get('upstream_host'), {}))
+MAX_REQUESTS_PER_SECOND = CONFIG.get(
+    'max_requests_per_second', UPSTREAM_RATE_LIMIT.get('rate', 1.5))
+
+# poll(district_id) returns how many session deltas the poll produced
+PollFunction = Callable[[int], int]
+
+
+class DistrictState:
+    __slots__ = (
+        'district_id', 'subscribers', 'churn', 'polls', 'due', 'version')
+
+    def __init__(self, district_id: int, subscribers: int) -> None:
+        self.district_id = district_id
+        self.subscribers = subscribers
+        # exponentially weighted share of recent polls that saw a change
+        self.churn = 0.0
+        self.polls = 0
+        self.due = math.inf
+        self.version = 0
+
+
+class AdaptiveScheduler:
+    """Decide when every district is polled next.
+
+    A district's interval shrinks with the log of its subscriber count
+    and with its recent churn, between `min_interval` and `max_interval`.
+    If the intervals together would exceed `max_requests_per_second`,
+    they are all stretched by the same factor; a token bucket enforces
+    the cap on top of that. Due times live in a heap, so picking the next
+    district is O(log n), and `run` sleeps on a condition variable until
+    the next due time instead of busy-waiting.
+    """
+
+    def __init__(
+        self,
+        base_interval: float = CONFIG.get('base_interval', 60),
+        min_interval: float = CONFIG.get('min_interval', 10),
+        max_interval: float = CONFIG.get('max_interval', 900),
+        churn_weight: float = CONFIG.get('churn_weight', 4),
+        churn_decay: float = CONFIG.get('churn_decay', 0.8),
+        max_requests_per_second: float = MAX_REQUESTS_PER_SECOND,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.churn_weight = churn_weight
+        self.churn_decay = churn_decay
+        self.max_requests_per_second = max_requests_per_second
+        self.clock = clock
+        self.bucket = TokenBucket(
+            max_requests_per_second, capacity=1, clock=clock)
+        self.districts: Dict[int, DistrictState] = {}
+        self.desired_rate = 0.0
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+        self._heap: List[Tuple[float, int, int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def __len__(self) -> int:
+        return len(self.districts)
+
+    def desired_interval(self, state: DistrictState) -> float:
+        if state.subscribers <= 0:
+            return self.max_interval
+        weight = ((1 + math.log2(1 + state.subscribers))
+                  * (1 + self.churn_weight * state.churn))
+        return min(max(self.base_interval / weight, self.min_interval),
+                   self.max_interval)
+
+    @property
+    def stretch(self) -> float:
+        """Factor applied to every interval to stay under the rate cap."""
+        return max(1.0, self.desired_rate / self.max_requests_per_second)
+
+    def interval(self, state: DistrictState) -> float:
+        return self.desired_interval(state) * self.stretch
+
+    def _push(self, state: DistrictState, due: float) -> None:
+        state.due = due
+        state.version += 1
+        heapq.heappush(
+            self._heap,
+            (due, next(self._sequence), state.district_id, state.version))
+
+    def _set_state(self, state: DistrictState, update: Callable[[], None]) -> None:
+        self.desired_rate -= 1 / self.desired_interval(state)
+        update()
+        self.desired_rate += 1 / self.desired_interval(state)
+
+    def set_subscribers(self, district_id: int, subscribers: int) -> None:
+        """Add a district, or change how many AlertConfigs point at it."""
+        with self._condition:
+            state = self.districts.get(district_id)
+            if state is None:
+                state = self.districts[district_id] = DistrictState(
+                    district_id, subscribers)
+                self.desired_rate += 1 / self.desired_interval(state)
+                self._push(state, self.clock())
+            else:
+                current = state
+
+                def update() -> None:
+                    current.subscribers = subscribers
+                self._set_state(current, update)
+                self._push(current, min(
+                    self.clock() + self.interval(current), current.due))
+            self._condition.notify()
+
+    def remove(self, district_id: int) -> None:
+        with self._condition:
+            state = self.districts.pop(district_id, None)
+            if state is not None:
+                self.desired_rate -= 1 / self.desired_interval(state)
+                # outdate its heap entry
+                state.version += 1
+
+    def record_poll(self, district_id: int, changes: int) -> Optional[float]:
+        """Update churn after a poll and schedule the district again.
+
+        Returns the new due time, or None if the district was removed
+        while it was being polled.
+        """
+        with self._condition:
+            found = self.districts.get(district_id)
+            if found is None:
+                return None
+            state = found
+
+            def update() -> None:
+                state.polls += 1
+                state.churn = (self.churn_decay * state.churn
+                               + (1 - self.churn_decay) * (1 if changes else 0))
+            self._set_state(state, update)
+            due = self.clock() + self.interval(state)
+            self._push(state, due)
+            return due
+
+    def peek(self) -> Optional[Tuple[float, int]]:
+        """(due time, district id) of the next district to poll."""
+        while self._heap:
+            due, _, district_id, version = self._heap[0]
+            state = self.districts.get(district_id)
+            if state is not None and state.version == version:
+                return due, district_id
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self) -> Tuple[Optional[int], Optional[float]]:
+        """Take the next due district, or say how long until one is due."""
+        with self._condition:
+            head = self.peek()
+            if head is None:
+                return None, None
+            due, district_id = head
+            delay = due - self.clock()
+            if delay > 0:
+                return None, delay
+            heapq.heappop(self._heap)
+            self.districts[district_id].due = math.inf
+            return district_id, None
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def run(self, poll: PollFunction) -> None:
+        """Poll districts as they fall due until `stop` is called.
+
+        A poll that raises counts as one without changes; it is recorded in
+        `errors` and `last_error` and does not stop the other districts.
+        """
+        with self._condition:
+            self._stopped = False
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                district_id, delay = self.pop_due()
+                if district_id is None:
+                    self._condition.wait(delay)
+                    continue
+            self.bucket.acquire()
+            changes = 0
+            try:
+                changes = poll(district_id)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            self.record_poll(district_id, changes)
+
+
+class SimulationClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SimulationResult(NamedTuple):
+    duration: float
+    polls: Dict[int, int]
+    deltas: Dict[int, int]
+
+    @property
+    def total_polls(self) -> int:
+        return sum(self.polls.values())
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.total_polls / self.duration if self.duration else 0.0
+
+
+def simulate(
+    recorded: Dict[int, Sequence[Sequence[JsonType]]],
+    subscribers: Dict[int, int],
+    duration: float,
+    **scheduler_options
+) -> SimulationResult:
+    """Replay recorded calendar snapshots on a virtual clock.
+
+    `recorded[district_id]` holds the successive `centers` lists returned
+    for a district; each simulated poll consumes the next one (the last
+    one repeats once they run out) and is diffed with a SnapshotStore.
+    """
+    clock = SimulationClock()
+    scheduler = AdaptiveScheduler(clock=clock, **scheduler_options)
+    snapshots = SnapshotStore()
+    polls = {district_id: 0 for district_id in recorded}
+    deltas = {district_id: 0 for district_id in recorded}
+    for district_id in recorded:
+        scheduler.set_subscribers(district_id, subscribers.get(district_id, 0))
+    while True:
+        due_id, delay = scheduler.pop_due()
+        if due_id is None:
+            if delay is None or clock.now + delay > duration:
+                break
+            clock.now += delay
+            continue
+        district_id = due_id
+        clock.now += scheduler.bucket.reserve()
+        if clock.now > duration:
+            break
+        history = recorded[district_id]
+        centers = history[min(polls[district_id], len(history) - 1)]
+        polls[district_id] += 1
+        changes = len(snapshots.diff(district_id, centers))
+        deltas[district_id] += changes
+        scheduler.record_poll(district_id, changes)
+    return SimulationResult(duration, polls, deltas)
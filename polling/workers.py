@@ -0,0 +1,286 @@
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import (
+    Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple)
+
+from helpers.base_request_handler import rate_limiters, reset_pool_manager
+from polling.scheduler import (
+    MAX_REQUESTS_PER_SECOND, AdaptiveScheduler, PollFunction)
+
+# called once inside each worker process to build its poll function, so
+# the compiled filters, snapshots and HTTP pool it closes over are local
+# to that process. It must be picklable (a module level function).
+PollFactory = Callable[[int], PollFunction]
+
+DEFAULT_REPLICAS = 100
+HEARTBEAT_INTERVAL = 1.0
+
+
+def ring_hash(key: Any) -> int:
+    digest = hashlib.md5(str(key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class ConsistentHashRing:
+    """Map keys to nodes so that adding or removing one of N nodes only
+    moves about 1/N of the keys. Every node is placed on the ring
+    `replicas` times to even out the share each one gets.
+    """
+
+    def __init__(
+        self, nodes: Iterable[int] = (), replicas: int = DEFAULT_REPLICAS
+    ) -> None:
+        self.replicas = replicas
+        self._points: List[Tuple[int, int]] = []
+        self._hashes: List[int] = []
+        self.nodes: List[int] = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(self, node: int) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for replica in range(self.replicas):
+            bisect.insort(
+                self._points, (ring_hash('{}-{}'.format(node, replica)), node))
+        self._hashes = [point for point, _ in self._points]
+
+    def remove(self, node: int) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        self._points = [p for p in self._points if p[1] != node]
+        self._hashes = [point for point, _ in self._points]
+
+    def get(self, key: Any) -> int:
+        if not self._points:
+            raise LookupError('The hash ring has no nodes')
+        position = bisect.bisect(self._hashes, ring_hash(key))
+        return self._points[position % len(self._points)][1]
+
+    def assign(self, keys: Iterable[Any]) -> Dict[int, List[Any]]:
+        assignment: Dict[int, List[Any]] = {node: [] for node in self.nodes}
+        for key in keys:
+            assignment[self.get(key)].append(key)
+        return assignment
+
+
+class WorkerHealth(NamedTuple):
+    worker_id: int
+    pid: int
+    districts: int
+    polls: int
+    errors: int
+    reported_at: float
+    rate_share: float
+
+
+class Assignment(NamedTuple):
+    subscribers: Dict[int, int]
+    max_requests_per_second: float
+    # fraction of every per-host rate limit this worker may use
+    rate_share: float
+
+
+def worker_main(
+    worker_id: int,
+    poll_factory: PollFactory,
+    commands: 'multiprocessing.Queue[Optional[Assignment]]',
+    health: 'multiprocessing.Queue[WorkerHealth]',
+    scheduler_options: Dict[str, Any],
+    heartbeat_interval: float = HEARTBEAT_INTERVAL
+) -> None:
+    """Entry point of a worker process.
+
+    Districts are polled by an AdaptiveScheduler on a background thread
+    while this thread applies new assignments from the supervisor and
+    reports health. A `None` command stops the worker.
+    """
+    # a forked child must not share the parent's pooled sockets
+    reset_pool_manager()
+    poll = poll_factory(worker_id)
+    scheduler = AdaptiveScheduler(**scheduler_options)
+    counters = {'polls': 0, 'errors': 0}
+
+    def counted_poll(district_id: int) -> int:
+        counters['polls'] += 1
+        try:
+            return poll(district_id)
+        except Exception:
+            counters['errors'] += 1
+            return 0
+
+    runner = threading.Thread(
+        target=scheduler.run, args=(counted_poll,), daemon=True)
+    runner.start()
+    while True:
+        try:
+            command = commands.get(timeout=heartbeat_interval)
+            received = True
+        except queue.Empty:
+            command, received = None, False
+        if received and command is None:
+            break
+        if command is not None:
+            scheduler.max_requests_per_second = command.max_requests_per_second
+            scheduler.bucket.configure(command.max_requests_per_second, 1)
+            rate_limiters.set_share(command.rate_share)
+            for district_id in list(scheduler.districts):
+                if district_id not in command.subscribers:
+                    scheduler.remove(district_id)
+            for district_id, count in command.subscribers.items():
+                scheduler.set_subscribers(district_id, count)
+        health.put(WorkerHealth(
+            worker_id, os.getpid(), len(scheduler), counters['polls'],
+            counters['errors'], time.time(), rate_limiters.share))
+    scheduler.stop()
+    runner.join(heartbeat_interval)
+
+
+class WorkerSupervisor:
+    """Run N polling worker processes over a consistent-hash ring of
+    districts and aggregate their health reports.
+
+    The global `max_requests_per_second` and the per-host rate limits of
+    the request handlers are split evenly between the workers. Adding or
+    removing a worker changes every worker's share, so all of them get a
+    new assignment; a subscriber change only reaches the worker that owns
+    the district.
+    """
+
+    def __init__(
+        self,
+        poll_factory: PollFactory,
+        subscribers: Dict[int, int],
+        num_workers: int = None,
+        scheduler_options: Dict[str, Any] = None,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+        context: Any = None
+    ) -> None:
+        self.poll_factory = poll_factory
+        self.subscribers = dict(subscribers)
+        self.scheduler_options = dict(scheduler_options or {})
+        self.max_requests_per_second = self.scheduler_options.pop(
+            'max_requests_per_second', MAX_REQUESTS_PER_SECOND)
+        self.heartbeat_interval = heartbeat_interval
+        self.context = context or multiprocessing.get_context('fork')
+        self.ring = ConsistentHashRing()
+        self.processes: Dict[int, Any] = {}
+        self.commands: Dict[int, Any] = {}
+        self.assignments: Dict[int, List[int]] = {}
+        self.health_queue = self.context.Queue()
+        self.reports: Dict[int, WorkerHealth] = {}
+        self._next_worker_id = 0
+        for _ in range(num_workers or os.cpu_count() or 1):
+            self.ring.add(self._new_worker_id())
+
+    def _new_worker_id(self) -> int:
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        return worker_id
+
+    def _share_per_worker(self) -> float:
+        return 1 / max(len(self.ring), 1)
+
+    def _start_process(self, worker_id: int) -> None:
+        commands = self.context.Queue()
+        process = self.context.Process(
+            target=worker_main, name='polling-worker-{}'.format(worker_id),
+            args=(worker_id, self.poll_factory, commands, self.health_queue,
+                  self.scheduler_options, self.heartbeat_interval),
+            daemon=True)
+        process.start()
+        self.processes[worker_id] = process
+        self.commands[worker_id] = commands
+
+    def _rebalance(self, force: bool = False) -> Dict[int, List[int]]:
+        """Send every worker whose districts changed its new assignment."""
+        assignments = self.ring.assign(sorted(self.subscribers))
+        share = self._share_per_worker()
+        for worker_id, districts in assignments.items():
+            if force or self.assignments.get(worker_id) != districts:
+                self.commands[worker_id].put(Assignment(
+                    {d: self.subscribers[d] for d in districts},
+                    self.max_requests_per_second * share, share))
+        self.assignments = assignments
+        return assignments
+
+    def start(self) -> None:
+        for worker_id in self.ring.nodes:
+            self._start_process(worker_id)
+        self._rebalance(force=True)
+
+    def add_worker(self) -> int:
+        worker_id = self._new_worker_id()
+        self.ring.add(worker_id)
+        self._start_process(worker_id)
+        # the rate share of every worker changes as well
+        self._rebalance(force=True)
+        return worker_id
+
+    def remove_worker(self, worker_id: int) -> None:
+        self.ring.remove(worker_id)
+        self._stop_process(worker_id)
+        self.assignments.pop(worker_id, None)
+        self.reports.pop(worker_id, None)
+        self._rebalance(force=True)
+
+    def set_subscribers(self, district_id: int, subscribers: int) -> None:
+        self.subscribers[district_id] = subscribers
+        worker_id = self.ring.get(district_id)
+        self.assignments.pop(worker_id, None)
+        self._rebalance()
+
+    def _stop_process(self, worker_id: int, timeout: float = 5) -> None:
+        self.commands.pop(worker_id).put(None)
+        process = self.processes.pop(worker_id)
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+
+    def stop(self) -> None:
+        for worker_id in list(self.processes):
+            self._stop_process(worker_id)
+
+    def collect(self) -> Dict[int, WorkerHealth]:
+        """Drain pending health reports, keeping the latest per worker."""
+        while True:
+            try:
+                report = self.health_queue.get_nowait()
+            except queue.Empty:
+                return self.reports
+            if report.worker_id in self.processes:
+                self.reports[report.worker_id] = report
+
+    def health(self, stale_after: float = None) -> Dict[str, Any]:
+        """Aggregate view of the workers: totals plus per-worker status."""
+        stale_after = stale_after or 3 * self.heartbeat_interval
+        reports = self.collect()
+        now = time.time()
+        workers = {}
+        for worker_id, process in self.processes.items():
+            report = reports.get(worker_id)
+            workers[worker_id] = {
+                'alive': process.is_alive(),
+                'healthy': (process.is_alive() and report is not None
+                            and now - report.reported_at <= stale_after),
+                'assigned': len(self.assignments.get(worker_id, [])),
+                'report': report,
+            }
+        return {
+            'workers': workers,
+            'healthy': all(w['healthy'] for w in workers.values()),
+            'districts': len(self.subscribers),
+            'polls': sum(r.polls for r in reports.values()),
+            'errors': sum(r.errors for r in reports.values()),
+        }
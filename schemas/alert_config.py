@@ -0,0 +1,13 @@
+from typing import Optional
+
+from schemas.base import BaseSchema
+
+
+class AlertConfigSchema(BaseSchema):
+    district_id: int
+    chat_id: str
+    name: str
+    description: Optional[str]
+
+    class Config:
+        orm_mode = True
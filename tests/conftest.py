@@ -1,12 +1,16 @@
-from typing import Optional
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+import json
 import os
+import threading
 from sqlalchemy import Table, Column, String, Integer, MetaData, TIMESTAMP, func
 import alembic.config
 from db.base import Base
 from schemas.base import BaseSchema
 from crud.base import CRUDBase
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from config import APP
@@ -92,3 +96,95 @@ def test_crud(test_model):
     yield CRUDBase(test_model)
 
 
+@pytest.fixture(scope='session')
+def count_queries():
+    """`with count_queries(db) as statements:` collects the SQL sent on
+    db's engine inside the block.
+    """
+    @contextmanager
+    def count(db):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        bind = db.get_bind()
+        event.listen(bind, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(bind, 'before_cursor_execute', before_cursor_execute)
+    yield count
+
+
+
+
+StubRoute = Callable[[BaseHTTPRequestHandler], Tuple[int, Dict[str, str], bytes]]
+
+
+class StubServer:
+    """Local HTTP server that echoes requests unless a route is registered."""
+
+    def __init__(self):
+        self.routes: Dict[str, StubRoute] = {}
+        self.hits: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle_request(self):
+                path = self.path.split('?')[0]
+                with stub.lock:
+                    stub.hits[path] = stub.hits.get(path, 0) + 1
+                route = stub.routes.get(path, stub.echo)
+                status, headers, body = route(self)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    @staticmethod
+    def echo(request: BaseHTTPRequestHandler):
+        length = int(request.headers.get('Content-Length') or 0)
+        data = request.rfile.read(length) if length else b''
+        body = json.dumps({
+            'method': request.command,
+            'path': request.path,
+            'headers': dict(request.headers),
+            'data': data.decode('utf-8'),
+        }).encode('utf-8')
+        return 200, {'Content-Type': 'application/json'}, body
+
+    def reset(self):
+        self.routes.clear()
+        self.hits.clear()
+
+
+@pytest.fixture(scope='session')
+def stub_server_session():
+    server = StubServer()
+    server.thread.start()
+    yield server
+    server.server.shutdown()
+
+
+@pytest.fixture(scope='function')
+def stub_server(stub_server_session):
+    stub_server_session.reset()
+    yield stub_server_session
@@ -0,0 +1,86 @@
+import pytest
+
+from crud.alert_config import alert_config
+from models.alert_config import AlertConfig
+from models.district import District
+from models.filters import ConfiguredFilter, Evaluators, Filters
+from models.state import State
+
+
+def walk(configs):
+    return [(config.district.state.name,
+             [f.value for f in config.configured_filters])
+            for config in configs]
+
+
+@pytest.fixture
+def configs(db_with_add):
+    for s in range(2):
+        state = State(name='state {}'.format(s), external_id=7000 + s)
+        for d in range(3):
+            district = District(
+                name='district {}'.format(d), external_id=7000 + 10 * s + d,
+                state=state)
+            for c in range(4):
+                AlertConfig(
+                    district=district, chat_id='chat', name='config',
+                    configured_filters=[
+                        ConfiguredFilter(filter=Filters.Age,
+                                         evaluator=Evaluators.Equals, value='18'),
+                        ConfiguredFilter(filter=Filters.Dose,
+                                         evaluator=Evaluators.Equals, value='1'),
+                    ])
+            db_with_add.add(district)
+    db_with_add.flush()
+    db_with_add.expire_all()
+    yield
+
+
+def test_matching_view_loads_in_constant_queries(
+        db_with_add, configs, count_queries):
+    with count_queries(db_with_add) as statements:
+        configs = alert_config.get_matching_view(db_with_add, {'chat_id': 'chat'})
+        walked = walk(configs)
+    assert len(configs) == 24
+    assert walked[0] == ('state 0', ['18', '1'])
+    assert len(statements) == 2
+
+
+def test_lazy_loading_fires_a_query_per_relationship(
+        db_with_add, configs, count_queries):
+    with count_queries(db_with_add) as statements:
+        walk(alert_config.get_multi(db_with_add, {'chat_id': 'chat'}))
+    assert len(statements) > 24
+
+
+def test_read_methods_accept_loader_options(
+        db_with_add, configs, count_queries):
+    first_id = alert_config.get(db_with_add, {'chat_id': 'chat'}).id
+    db_with_add.expire_all()
+    with count_queries(db_with_add) as statements:
+        config = alert_config.get_by_id(db_with_add, first_id, options='filters')
+        assert len(config.configured_filters) == 2
+        rows = list(alert_config.iter_all(
+            db_with_add, {'chat_id': 'chat'}, chunk_size=5, options='matching'))
+        walk(rows)
+    assert len(rows) == 24
+    # get_by_id with its filters, then the streamed query plus one
+    # filters query per chunk of 5
+    assert len(statements) == 2 + 1 + 5
+
+
+def test_unknown_preset(db_with_add):
+    with pytest.raises(ValueError):
+        alert_config.get(db_with_add, {}, options='everything')
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+def test_removing_configs_detaches_their_filters(db_with_add, configs, bulk):
+    configs = alert_config.get_multi(db_with_add, {'chat_id': 'chat'}, limit=2)
+    ids = [config.id for config in configs]
+    loaded_filter = configs[0].configured_filters[0]
+    alert_config.remove_multi_with_id(db_with_add, ids, bulk=bulk)
+    db_with_add.flush()
+    assert db_with_add.query(ConfiguredFilter).filter(
+        ConfiguredFilter.alert_config_id.in_(ids)).count() == 0
+    assert loaded_filter.alert_config_id is None
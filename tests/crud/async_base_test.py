@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from sqlalchemy import inspect
+
+from crud.async_base import AsyncCRUDBase
+from crud.base import CRUDListener
+from db.base import async_session, create_async_db_engine
+
+from config import APP
+
+URL = APP['test']['database']['url']
+
+
+class RecordingListener(CRUDListener):
+    def __init__(self):
+        self.written, self.removed = [], []
+
+    def after_write(self, db, ids):
+        self.written.extend(ids)
+
+    def after_remove(self, db, ids):
+        self.removed.extend(ids)
+
+
+@pytest.fixture
+def run():
+    engine = create_async_db_engine(URL, {})
+
+    def run(test):
+        async def session_scope():
+            async with async_session(bind=engine) as db:
+                return await test(db)
+        return asyncio.run(session_scope())
+
+    yield run
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def crud(test_model):
+    yield AsyncCRUDBase(test_model)
+
+
+def test_create_and_read(run, crud, test_schema):
+    listener = RecordingListener()
+    crud.add_listener(listener)
+
+    async def test(db):
+        created = await crud.create(db, test_schema(name='async', test_int=1))
+        assert (await crud.get_by_id(db, created.id)) is created
+        assert (await crud.get(db, {'name': 'async', 'test_int': 1})) is created
+        ids = await crud.create_multi(
+            db, [test_schema(name='async', test_int=i) for i in range(2, 6)],
+            bulk=True, return_ids=True)
+        page = await crud.get_multi(
+            db, {'name': 'async'}, after_id=created.id, limit=2,
+            columns=['test_int'])
+        streamed = [obj.test_int async for obj in crud.iter_all(
+            db, {'name': 'async'}, chunk_size=2)]
+        for _id in [created.id] + ids:
+            await crud.remove_with_id(db, _id)
+        return created.id, ids, page, streamed
+
+    created_id, ids, page, streamed = run(test)
+    assert page == [(2,), (3,)]
+    assert streamed == [1, 2, 3, 4, 5]
+    assert listener.written == [created_id] + ids
+    assert listener.removed == [created_id] + ids
+
+
+def test_update_and_remove(run, crud, test_schema):
+    async def test(db):
+        objs = [await crud.create(db, test_schema(name='async', test_int=i))
+                for i in range(3)]
+        updated = await crud.update(db, objs[0], {'test_int': 10})
+        assert updated.test_int == 10
+        assert await crud.update_multi(db, [
+            {'db_obj': obj, 'obj_in': {'test_int': 20}} for obj in objs[1:]
+        ], bulk=True) == 2
+        assert objs[2].test_int == 20
+        await crud.remove(db, objs[0])
+        assert await crud.remove_multi(db, objs[1:], bulk=True) == 2
+        return await crud.get_multi(db, {'name': 'async'})
+
+    assert run(test) == []
+
+
+def test_refresh(run, crud, test_schema):
+    async def test(db):
+        refreshed = await crud.create(
+            db, test_schema(name='async', test_int=1))
+        unrefreshed = await crud.create(
+            db, test_schema(name='async', test_int=2), refresh=False)
+        # created_at is filled in by the database, so only a refresh loads it
+        states = ('created_at' in inspect(refreshed).unloaded,
+                  'created_at' in inspect(unrefreshed).unloaded)
+        await crud.remove_multi(db, [refreshed, unrefreshed], bulk=True)
+        return states
+
+    assert run(test) == (False, True)
+
+
+def test_batch_commits_once_and_notifies_after(run, crud, test_schema):
+    listener = RecordingListener()
+    crud.add_listener(listener)
+
+    async def test(db):
+        async with crud.batch(db, flush_size=2) as work:
+            created = await crud.create(
+                db, test_schema(name='batch', test_int=1))
+            await crud.create_multi(
+                db, [test_schema(name='batch', test_int=i) for i in (2, 3)])
+            assert listener.written == []
+            assert 'created_at' in inspect(created).unloaded
+        rows = await crud.get_multi(db, {'name': 'batch'}, columns=['id'])
+        await crud.remove_multi_with_id(
+            db, [row.id for row in rows], bulk=True)
+        return work.flushes, [row.id for row in rows]
+
+    flushes, ids = run(test)
+    assert flushes == 1
+    assert sorted(listener.written) == ids
+
+
+def test_batch_rolls_back(run, crud, test_schema):
+    async def test(db):
+        with pytest.raises(RuntimeError):
+            async with crud.batch(db):
+                await crud.create(db, test_schema(name='batch', test_int=1))
+                raise RuntimeError
+        return await crud.get_multi(db, {'name': 'batch'})
+
+    assert run(test) == []
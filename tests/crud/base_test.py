@@ -1,4 +1,12 @@
-from crud.base import CRUDBase
+from datetime import datetime
+
+import pytest
+
+from crud.base import CRUDBase, CRUDListener
+from models.alert_config import AlertConfig  # noqa: F401
+from models.district import District  # noqa: F401
+from models.filters import ConfiguredFilter, Evaluators, Filters
+from models.state import State
 from time import sleep
 
 
@@ -34,6 +42,39 @@ class TestGetData:
         retrieved_data = CRUDBase(test_model).get(db_with_add, filters2)
         assert retrieved_data == obj_data2
 
+    def test_get_multi_with_keyset_pagination(
+            self, db_with_add, test_crud, test_schema):
+        ids = test_crud.create_multi(
+            db_with_add, [test_schema(name='page', test_int=i) for i in range(7)],
+            return_ids=True)
+        pages, after_id = [], 0
+        while True:
+            page = test_crud.get_multi(
+                db_with_add, {'name': 'page'}, limit=3, after_id=after_id)
+            if not page:
+                break
+            pages.append([obj.test_int for obj in page])
+            after_id = page[-1].id
+        assert pages == [[0, 1, 2], [3, 4, 5], [6]]
+        assert after_id == ids[-1]
+
+    def test_get_multi_with_columns(self, db_with_add, test_crud, test_schema):
+        test_crud.create(db_with_add, test_schema(name='cols', test_int=5))
+        rows = test_crud.get_multi(
+            db_with_add, {'name': 'cols'}, columns=['name', 'test_int'])
+        assert rows == [('cols', 5)]
+        assert rows[0].test_int == 5
+
+    def test_iter_all(self, db_with_add, test_crud, test_schema):
+        ids = test_crud.create_multi(
+            db_with_add, [test_schema(name='iter', test_int=i) for i in range(25)],
+            return_ids=True)
+        rows = test_crud.iter_all(db_with_add, {'name': 'iter'}, chunk_size=4)
+        assert [obj.id for obj in rows] == ids
+        rows = test_crud.iter_all(
+            db_with_add, {'name': 'iter'}, columns=['test_int'], chunk_size=4)
+        assert [row.test_int for row in rows] == list(range(25))
+
 
 class TestCreateData:
 
@@ -60,6 +101,46 @@ class TestCreateData:
         assert obj_retrieved.name == obj2['name']
         assert obj_retrieved.test_int == obj2['test_int']
 
+    def test_create_multi_returns_ids(self, db_with_add, test_crud, test_schema):
+        objs_in = [test_schema(name='ids', test_int=i) for i in range(3)]
+        ids = test_crud.create_multi(db_with_add, objs_in, return_ids=True)
+        assert [test_crud.get_by_id(db_with_add, _id).test_int
+                for _id in ids] == [0, 1, 2]
+
+    def test_create_multi_reads_ids_before_the_commit(
+            self, db_with_add, test_model, test_schema, monkeypatch,
+            count_queries):
+        def commit():
+            # like a real commit, leave every object expired
+            db_with_add.flush()
+            db_with_add.expire_all()
+        monkeypatch.setattr(db_with_add, 'commit', commit)
+        crud = CRUDBase(test_model)
+        crud.add_listener(CRUDListener())
+        objs_in = [test_schema(name='ids', test_int=i) for i in range(50)]
+        with count_queries(db_with_add) as statements:
+            ids = crud.create_multi(db_with_add, objs_in, return_ids=True)
+        assert len(set(ids)) == 50
+        assert not [s for s in statements if s.startswith('SELECT')]
+
+    def test_bulk_create_multi(self, db_with_add, test_crud, test_schema):
+        objs_in = [test_schema(name='bulk', test_int=i) for i in range(25)]
+        assert test_crud.create_multi(
+            db_with_add, objs_in, bulk=True, chunk_size=10) is None
+        retrieved = test_crud.get_multi(db_with_add, {'name': 'bulk'})
+        assert sorted(obj.test_int for obj in retrieved) == list(range(25))
+        assert all(obj.created_at is not None for obj in retrieved)
+
+    def test_bulk_create_multi_returns_ids(
+            self, db_with_add, test_crud, test_schema):
+        objs_in = [test_schema(name='bulk', test_int=i) for i in range(25)]
+        objs_in.append({'name': 'bulk', 'test_int': 25, 'unknown': 1})
+        ids = test_crud.create_multi(
+            db_with_add, objs_in, bulk=True, chunk_size=10, return_ids=True)
+        assert len(ids) == len(set(ids)) == 26
+        assert [test_crud.get_by_id(db_with_add, _id).test_int
+                for _id in ids] == list(range(26))
+
 
 class TestUpdateData:
 
@@ -153,6 +234,23 @@ class TestUpdateData:
         assert retrieved_obj2.name == updated_obj_schema2.name
         assert retrieved_obj2.test_int == updated_obj_schema2.test_int
 
+    def test_bulk_update_multi(self, db_with_add, test_crud, test_schema):
+        db_objs = [test_crud.create(db_with_add, test_schema(name='bulk', test_int=i))
+                   for i in range(5)]
+        objs_in = [{'db_obj': db_obj, 'obj_in': {'test_int': db_obj.test_int + 10}}
+                   for db_obj in db_objs[:3]]
+        objs_in.append({'db_obj': db_objs[3], 'obj_in': test_schema(
+            name='renamed', test_int=13)})
+        objs_in.append({'id': db_objs[4].id, 'obj_in': {'test_int': 14}})
+        updated = test_crud.update_multi(
+            db_with_add, objs_in, bulk=True, chunk_size=2)
+        assert updated == 5
+        assert [obj.test_int for obj in db_objs[:4]] == [10, 11, 12, 13]
+        assert db_objs[3].name == 'renamed'
+        db_with_add.expire_all()
+        assert [test_crud.get_by_id(db_with_add, obj.id).test_int
+                for obj in db_objs] == [10, 11, 12, 13, 14]
+
 
 class TestRemoveData:
     def test_remove_single_data_with_id(self, db_with_add, test_crud, test_schema):
@@ -192,3 +290,194 @@ class TestRemoveData:
 
         assert test_crud.get_by_id(db_with_add, obj_created1.id) is None
         assert test_crud.get_by_id(db_with_add, obj_created2.id) is None
+
+    def test_bulk_remove_multiple_data_with_id(
+            self, db_with_add, test_crud, test_schema):
+        ids = test_crud.create_multi(
+            db_with_add, [test_schema(name='bulk', test_int=i) for i in range(7)],
+            return_ids=True)
+        removed = test_crud.remove_multi_with_id(
+            db_with_add, ids + [-1], bulk=True, chunk_size=3)
+        assert removed == 7
+        assert all(test_crud.get_by_id(db_with_add, _id) is None for _id in ids)
+
+    def test_bulk_remove_multiple_data(self, db_with_add, test_crud, test_schema):
+        objs = [test_crud.create(db_with_add, test_schema(name='bulk', test_int=i))
+                for i in range(3)]
+        assert test_crud.remove_multi(db_with_add, objs, bulk=True) == 3
+        assert test_crud.get_multi(db_with_add, {'name': 'bulk'}) == []
+
+
+class TestUpsertData:
+
+    def test_upsert_multi_inserts_then_updates(self, db_with_add):
+        crud = CRUDBase(State)
+        rows = [{'name': 'State {}'.format(i), 'external_id': 9000 + i}
+                for i in range(5)]
+        assert crud.upsert_multi(db_with_add, rows, chunk_size=2) == 5
+        created = {s.external_id: s.id for s in crud.iter_all(db_with_add)
+                   if s.external_id >= 9000}
+
+        rows[0]['name'] = 'Renamed'
+        rows.append({'name': 'State 5', 'external_id': 9005})
+        assert crud.upsert_multi(db_with_add, rows) == 6
+        db_with_add.expire_all()
+        states = {s.external_id: s for s in crud.iter_all(db_with_add)
+                  if s.external_id >= 9000}
+        assert len(states) == 6
+        assert states[9000].name == 'Renamed'
+        assert all(states[key].id == _id for key, _id in created.items())
+
+    def test_upsert_multi_tells_listeners_the_ids(self, db_with_add):
+        crud = CRUDBase(State)
+        written = []
+
+        class Recorder(CRUDListener):
+            def after_write(self, db, ids):
+                written.extend(ids)
+        crud.add_listener(Recorder())
+        existing = crud.create(db_with_add, {'name': 'Old', 'external_id': 9100})
+        rows = [{'name': 'State {}'.format(i), 'external_id': 9100 + i}
+                for i in range(3)]
+        crud.upsert_multi(db_with_add, rows, chunk_size=2)
+        ids = {s.external_id: s.id for s in crud.iter_all(db_with_add)
+               if s.external_id >= 9100}
+        assert sorted(written) == sorted(
+            [existing.id] + list(ids.values()))
+
+    def test_upsert_multi_needs_a_natural_key(self, db_with_add, test_crud):
+        with pytest.raises(TypeError):
+            test_crud.upsert_multi(db_with_add, [{'name': 'x'}])
+
+
+class TestBatch:
+
+    @pytest.fixture
+    def commits(self, db_with_add, monkeypatch):
+        commits = []
+
+        def commit():
+            commits.append(True)
+            db_with_add.flush()
+        monkeypatch.setattr(db_with_add, 'commit', commit)
+        yield commits
+
+    def test_batch_commits_once(self, db_with_add, test_crud, test_schema, commits):
+        with test_crud.batch(db_with_add, flush_size=2) as work:
+            created = [test_crud.create(db_with_add, test_schema(name='uow', test_int=i))
+                       for i in range(5)]
+            test_crud.update(db_with_add, created[0], {'test_int': 10})
+            test_crud.remove(db_with_add, created[1])
+            assert commits == []
+            assert work.flushes == 3
+        assert commits == [True]
+        retrieved = test_crud.get_multi(db_with_add, {'name': 'uow'})
+        assert sorted(obj.test_int for obj in retrieved) == [2, 3, 4, 10]
+
+    def test_refresh_is_opt_in(self, db_with_add, test_crud, test_schema, commits):
+        with test_crud.batch(db_with_add):
+            lazy = test_crud.create(db_with_add, test_schema(name='uow'))
+            assert lazy.id is None
+            eager = test_crud.create(
+                db_with_add, test_schema(name='uow'), refresh=True)
+            assert eager.id is not None and eager.created_at is not None
+
+    def test_batch_rolls_back_on_error(self, db_with_add, test_crud, test_schema):
+        with pytest.raises(ValueError):
+            with test_crud.batch(db_with_add):
+                test_crud.create(db_with_add, test_schema(name='uow'))
+                raise ValueError
+        assert test_crud.get(db_with_add, {'name': 'uow'}) is None
+        assert test_crud.current_batch(db_with_add) is None
+
+    def test_listeners_hear_after_commit(
+            self, db_with_add, test_model, test_schema, commits):
+        test_crud = CRUDBase(test_model)
+        events = []
+
+        class Listener(CRUDListener):
+            def after_write(self, db, ids):
+                events.append(('write', len(commits), ids))
+
+            def after_remove(self, db, ids):
+                events.append(('remove', len(commits), ids))
+
+        test_crud.add_listener(Listener())
+        with test_crud.batch(db_with_add):
+            obj = test_crud.create(db_with_add, test_schema(name='uow'))
+            with test_crud.batch(db_with_add):
+                ids = test_crud.create_multi(
+                    db_with_add, [test_schema(name='uow')], return_ids=True)
+            test_crud.remove_multi_with_id(db_with_add, ids, bulk=True)
+            assert events == []
+        assert events == [('write', 1, [obj.id] + ids), ('remove', 1, ids)]
+
+
+class TestHydration:
+
+    def test_update_only_sets_fields_that_were_set(self, test_model, test_schema):
+        db_obj = test_model(name='before', test_string='kept', test_int=1)
+        CRUDBase.set_data_for_update(db_obj, test_schema(name='after'))
+        assert (db_obj.name, db_obj.test_string, db_obj.test_int) == (
+            'after', 'kept', 1)
+
+    def test_unknown_fields_are_skipped(self, test_model):
+        db_obj = test_model(name='known')
+        CRUDBase.set_data_for_update(db_obj, {'test_int': 2, 'unknown': 1})
+        assert db_obj.test_int == 2
+        assert not hasattr(db_obj, 'unknown')
+
+    def test_values_are_passed_through_unencoded(self, test_model):
+        created_at = datetime(2021, 5, 20, 9, 30)
+        db_obj = CRUDBase(ConfiguredFilter).build({
+            'filter': Filters.Age, 'evaluator': Evaluators.Equals,
+            'value': '18'})
+        assert db_obj.filter is Filters.Age
+        assert db_obj.evaluator is Evaluators.Equals
+        row = test_model(name='dated')
+        CRUDBase.set_data_for_update(row, {'created_at': created_at})
+        assert row.created_at is created_at
+
+
+class TestStatementCache:
+
+    @pytest.fixture
+    def test_crud(self, test_model):
+        yield CRUDBase(test_model)
+
+    def test_reads_reuse_statements(self, db_with_add, test_crud, test_schema):
+        obj = test_crud.create(db_with_add, test_schema(name='cached', test_int=1))
+        for _ in range(3):
+            assert test_crud.get_by_id(db_with_add, obj.id) is obj
+            assert test_crud.get(
+                db_with_add, {'test_int': 1, 'name': 'cached'}) is obj
+            assert test_crud.get_multi(
+                db_with_add, {'name': 'cached'}, after_id=0) == [obj]
+        assert test_crud.get(db_with_add, {'name': 'cached', 'test_int': 2}) is None
+        stats = test_crud.statement_stats()
+        assert stats['statements'] == 3
+        assert (stats['statement_hits'], stats['statement_misses']) == (7, 3)
+        # the first call of each shape may already find SQL compiled by
+        # another CRUD object for the same table
+        assert stats['compiled_hits'] >= 7
+        assert stats['compiled_hits'] + stats['compiled_misses'] == 10
+
+    def test_none_filters_match_null(self, db_with_add, test_crud, test_schema):
+        unset = test_crud.create(db_with_add, test_schema(name='null'))
+        set_ = test_crud.create(
+            db_with_add, test_schema(name='null', test_int=1))
+        assert test_crud.get(
+            db_with_add, {'name': 'null', 'test_int': None}) is unset
+        assert test_crud.get_multi(
+            db_with_add, {'name': 'null', 'test_int': None}) == [unset]
+        assert test_crud.get_multi(
+            db_with_add, {'name': 'null', 'test_int': 1}, after_id=0) == [set_]
+        # NULL and non-NULL values of a field are different statements
+        assert test_crud.get(
+            db_with_add, {'name': 'null', 'test_int': 1}) is set_
+        assert len(test_crud.statements) == 4
+
+    def test_ad_hoc_options_are_not_cached(self, db_with_add, test_crud):
+        test_crud.get_by_id(db_with_add, 1, options=[])
+        test_crud.get_by_id(db_with_add, 1)
+        assert len(test_crud.statements) == 1
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy.orm import selectinload
+
+from crud.cached import CachedCRUD
+from models.district import District
+from models.state import State
+
+
+@pytest.fixture
+def crud():
+    yield CachedCRUD(State)
+
+
+@pytest.fixture
+def state(db_with_add):
+    state = State(name='Kerala', external_id=8017)
+    db_with_add.add(state)
+    db_with_add.flush()
+    yield state
+    # cache hits merged into the shared session outlive the rollback
+    db_with_add.expunge_all()
+
+
+def test_hits_do_not_touch_the_database(db_with_add, crud, state, count_queries):
+    assert crud.get_by_id(db_with_add, state.id) is state
+    assert crud.get(db_with_add, {'external_id': 8017}) is state
+    db_with_add.expunge_all()
+    with count_queries(db_with_add) as statements:
+        by_id = crud.get_by_id(db_with_add, state.id)
+        by_key = crud.get_by_natural_key(db_with_add, 8017)
+        assert by_id is by_key
+        assert by_id.name == 'Kerala'
+    assert statements == []
+    assert crud.stats()['by_id']['hit_ratio'] == 0.5
+    # get_by_id cached the row under its external_id as well
+    assert crud.stats()['by_key'] == dict(
+        crud.stats()['by_key'], hits=2, misses=0, hit_ratio=1.0)
+
+
+def test_hits_keep_the_sessions_own_changes(
+        db_with_add, crud, state, count_queries):
+    crud.get_by_id(db_with_add, state.id)
+    state.name = 'Keralam'
+    with count_queries(db_with_add) as statements:
+        assert crud.get_by_id(db_with_add, state.id) is state
+        assert crud.get_by_natural_key(db_with_add, 8017) is state
+    assert statements == []
+    assert state.name == 'Keralam'
+    assert state in db_with_add.dirty
+
+
+def test_writes_invalidate(db_with_add, crud, state):
+    crud.get_by_id(db_with_add, state.id)
+    crud.update(db_with_add, state, {'name': 'Keralam'})
+    assert len(crud.by_id) == len(crud.by_key) == 0
+    db_with_add.expunge_all()
+    assert crud.get_by_natural_key(db_with_add, 8017).name == 'Keralam'
+    crud.remove_with_id(db_with_add, state.id)
+    assert crud.get_by_id(db_with_add, state.id) is None
+
+
+def test_other_filters_and_options_bypass_the_cache(db_with_add, crud, state):
+    assert crud.get(db_with_add, {'name': 'Kerala'}) is state
+    assert crud.get_by_id(
+        db_with_add, state.id, options=[selectinload(State.districts)]) is state
+    assert len(crud.by_id) == 0
+
+
+def test_entries_expire(db_with_add, state, count_queries):
+    crud = CachedCRUD(District, ttl=0)
+    district = District(name='Wayanad', external_id=8018, state=state)
+    db_with_add.add(district)
+    db_with_add.flush()
+    crud.get_by_id(db_with_add, district.id)
+    with count_queries(db_with_add) as statements:
+        crud.get_by_id(db_with_add, district.id)
+    assert len(statements) == 1
+
+
+def test_upsert_invalidates_the_rows_it_touched(db_with_add, crud, state):
+    other = State(name='Goa', external_id=8030)
+    db_with_add.add(other)
+    db_with_add.flush()
+    crud.get_by_id(db_with_add, state.id)
+    crud.get_by_id(db_with_add, other.id)
+    crud.upsert_multi(db_with_add, [{'name': 'Keralam', 'external_id': 8017}])
+    assert crud.by_id.get(state.id) is None
+    assert crud.by_id.get(other.id) is not None
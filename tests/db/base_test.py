@@ -1,4 +1,9 @@
-from db.base import get_table_name, db_session
+import asyncio
+
+import db.base
+from db.base import (
+    async_db_session, create_db_engine, get_table_name, db_session)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
@@ -9,4 +14,31 @@ def test_get_table_name_returns_snake_case():
 
 def test_db_session():
     with db_session() as db:
-        assert isinstance(db, Session)
\ No newline at end of file
+        assert isinstance(db, Session)
+
+def test_sqlite_engine_sets_pragmas(tmp_path):
+    engine = create_db_engine('sqlite:///{}'.format(tmp_path / 'pragmas.db'))
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+    engine.dispose()
+
+
+def test_engine_pool_options_for_other_databases(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        db.base, 'create_engine', lambda url, **kwargs: calls.append(kwargs))
+    create_db_engine(
+        'postgresql://user@localhost/cowin',
+        {'pool': {'size': 3, 'max_overflow': 4, 'pre_ping': True}})
+    assert calls == [{'pool_size': 3, 'max_overflow': 4,
+                      'pool_pre_ping': True, 'pool_recycle': -1,
+                      'query_cache_size': 500}]
+
+
+def test_async_db_session():
+    async def open_session():
+        async with async_db_session() as db:
+            return isinstance(db, AsyncSession)
+    assert asyncio.run(open_session())
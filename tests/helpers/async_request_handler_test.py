@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from helpers.async_request_handler import (
+    AsyncBaseRequestHandler, fetch_all, gather_bounded)
+
+
+class MockAsyncRequestHandler(AsyncBaseRequestHandler):
+    URL = ''
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return self.URL
+
+    def response_handler(self, response) -> dict:
+        return json.loads(response.data)
+
+
+@pytest.fixture
+def async_handler(stub_server, monkeypatch):
+    monkeypatch.setattr(MockAsyncRequestHandler, 'URL', stub_server.url)
+    yield MockAsyncRequestHandler
+
+
+def test_init_does_not_fire_request(async_handler, stub_server):
+    handler = async_handler(relative_url='/lazy')
+    assert handler.response == {}
+    assert '/lazy' not in stub_server.hits
+
+
+def test_fetch(async_handler):
+    handler = async_handler(relative_url='/fetch', params={'a': 'b'})
+    response = asyncio.run(handler.fetch())
+    assert response['path'] == '/fetch?a=b'
+    assert handler.response == response
+
+
+def test_fetch_all_keeps_order(async_handler):
+    handlers = [async_handler(relative_url='/d/{}'.format(i)) for i in range(10)]
+    responses = asyncio.run(fetch_all(handlers, limit=4))
+    assert [r['path'] for r in responses] == ['/d/{}'.format(i) for i in range(10)]
+
+
+def test_fetch_all_respects_limit(async_handler, stub_server):
+    state = {'active': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def slow(request):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.05)
+        with lock:
+            state['active'] -= 1
+        return 200, {}, b'{}'
+
+    stub_server.routes['/slow'] = slow
+    handlers = [async_handler(relative_url='/slow', params={'i': i})
+                for i in range(9)]
+    asyncio.run(fetch_all(handlers, limit=3))
+    assert stub_server.hits['/slow'] == 9
+    assert state['peak'] <= 3
+
+
+def test_gather_bounded_return_exceptions():
+    async def fail():
+        raise ValueError
+
+    async def succeed():
+        return 1
+
+    results = asyncio.run(
+        gather_bounded([succeed(), fail()], limit=1, return_exceptions=True))
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+
+
+def test_identical_fetches_are_coalesced(async_handler, stub_server):
+    def slow(request):
+        time.sleep(0.05)
+        return 200, {}, b'{"n": 1}'
+
+    stub_server.routes['/same'] = slow
+    handlers = [async_handler(relative_url='/same') for _ in range(5)]
+    responses = asyncio.run(fetch_all(handlers))
+    assert stub_server.hits['/same'] == 1
+    assert all(r == {'n': 1} for r in responses)
+    assert all(h.response == {'n': 1} for h in handlers)
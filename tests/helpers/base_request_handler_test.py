@@ -2,9 +2,17 @@ from urllib.parse import urlencode
 
 import pytest
 import json
+import time
 from urllib3.exceptions import MaxRetryError
 
+from helpers import base_request_handler
 from helpers.base_request_handler import BaseRequestHandler
+from helpers.json_stream import stream_array_items
+from helpers.request_batch import RequestBatch
+from helpers.response_cache import ResponseCache
+from helpers.retry_policy import RetryPolicy
+from helpers.rate_limiter import RateLimiterRegistry
+from errors import UpstreamRequestException
 
 BASE_URL = 'https://httpbin.org'
 
@@ -84,7 +92,7 @@ class TestClassBaseRequestHandler:
         r = self.MockRequestHandler(parent_init=False).fire_request()
         data = json.loads(r.data)
 
-        assert data['data'] == json.dumps(body)
+        assert json.loads(data['data']) == body
 
         # checking the headers
         assert 'H' in data['headers']
@@ -157,3 +165,248 @@ class TestClassBaseRequestHandler:
         assert handler.HEADERS == headers
         assert handler.PARAMS == params
         assert handler.BODY == body
+
+
+class StubRequestHandler(BaseRequestHandler):
+    URL = ''
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return self.URL
+
+    def response_handler(self, response) -> dict:
+        return self.parse_json(response)
+
+
+@pytest.fixture
+def stub_handler(stub_server, monkeypatch):
+    monkeypatch.setattr(StubRequestHandler, 'URL', stub_server.url)
+    base_request_handler.reset_pool_manager()
+    yield StubRequestHandler
+    base_request_handler.reset_pool_manager()
+
+
+class TestPooledClient:
+
+    def test_pool_manager_is_shared(self):
+        assert (base_request_handler.get_pool_manager()
+                is base_request_handler.get_pool_manager())
+
+    def test_connections_are_reused(self, stub_handler, stub_server):
+        for _ in range(5):
+            stub_handler(relative_url='/reuse')
+        stats = base_request_handler.get_pool_stats()
+        host_stats = next(iter(stats.values()))
+        assert host_stats['requests'] == 5
+        assert host_stats['connections_created'] == 1
+        assert host_stats['connections_reused'] == 4
+        assert stub_server.hits['/reuse'] == 5
+
+    def test_reset_pool_manager_clears_stats(self, stub_handler):
+        stub_handler()
+        base_request_handler.reset_pool_manager()
+        assert base_request_handler.get_pool_stats() == {}
+
+    def test_keep_alive_disabled_sends_connection_close(
+            self, stub_handler, monkeypatch):
+        monkeypatch.setitem(base_request_handler.POOL_CONFIG, 'keep_alive', False)
+        r = stub_handler()
+        assert r.response['headers']['Connection'] == 'close'
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def cached_handler(self, stub_handler, monkeypatch):
+        monkeypatch.setattr(stub_handler, 'CACHE_TTL', 60)
+        monkeypatch.setattr(stub_handler, 'RESPONSE_CACHE', ResponseCache(4))
+        yield stub_handler
+
+    @staticmethod
+    def etag_route(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, {'ETag': '"v1"'}, b'{"version": 1}'
+
+    def test_fresh_response_is_served_from_cache(self, cached_handler, stub_server):
+        first = cached_handler(relative_url='/cached', params={'a': 'b'})
+        second = cached_handler(relative_url='/cached', params={'a': 'b'})
+        assert first.response == second.response
+        assert stub_server.hits['/cached'] == 1
+        stats = cached_handler.RESPONSE_CACHE.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_different_params_are_cached_separately(
+            self, cached_handler, stub_server):
+        cached_handler(relative_url='/cached', params={'a': 'b'})
+        cached_handler(relative_url='/cached', params={'a': 'c'})
+        assert stub_server.hits['/cached'] == 2
+
+    def test_handler_classes_are_cached_separately(
+            self, cached_handler, stub_server):
+        class OtherHandler(cached_handler):
+            def response_handler(self, response):
+                return {'parsed_by': 'other'}
+
+        first = cached_handler(relative_url='/cached')
+        other = OtherHandler(relative_url='/cached')
+        assert other.response == {'parsed_by': 'other'}
+        assert first.response != other.response
+        assert stub_server.hits['/cached'] == 2
+
+    def test_caching_disabled_without_ttl(self, stub_handler, stub_server):
+        stub_handler(relative_url='/uncached')
+        stub_handler(relative_url='/uncached')
+        assert stub_server.hits['/uncached'] == 2
+
+    def test_only_get_requests_are_cached(self, cached_handler, stub_server):
+        cached_handler(relative_url='/post', method='POST')
+        cached_handler(relative_url='/post', method='POST')
+        assert stub_server.hits['/post'] == 2
+
+    def test_stale_entry_is_revalidated_with_etag(
+            self, cached_handler, stub_server, monkeypatch):
+        stub_server.routes['/etag'] = self.etag_route
+        monkeypatch.setattr(cached_handler, 'CACHE_TTL', 0)
+        first = cached_handler(relative_url='/etag')
+        second = cached_handler(relative_url='/etag')
+        assert first.response == second.response == {'version': 1}
+        assert stub_server.hits['/etag'] == 2
+        stats = cached_handler.RESPONSE_CACHE.stats()
+        assert stats['revalidations'] == 1
+        assert stats['not_modified'] == 1
+
+
+class TestRetryAndRateLimit:
+
+    @pytest.fixture
+    def retry_handler(self, stub_handler, monkeypatch):
+        self.slept = []
+        monkeypatch.setattr(stub_handler, 'RETRY_POLICY', RetryPolicy(
+            max_retries=2, rand=lambda: 1.0, sleep=self.slept.append))
+        yield stub_handler
+
+    @staticmethod
+    def flaky_route(statuses):
+        def route(request):
+            status = statuses.pop(0) if statuses else 200
+            headers = {'Retry-After': '3'} if status == 429 else {}
+            return status, headers, b'{}'
+        return route
+
+    def test_transient_errors_are_retried(self, retry_handler, stub_server):
+        stub_server.routes['/flaky'] = self.flaky_route([503, 502])
+        r = retry_handler(relative_url='/flaky')
+        assert r.response == {}
+        assert stub_server.hits['/flaky'] == 3
+        assert self.slept == [0.5, 1.0]
+
+    def test_retry_after_is_honoured(self, retry_handler, stub_server):
+        stub_server.routes['/throttled'] = self.flaky_route([429])
+        retry_handler(relative_url='/throttled')
+        assert self.slept == [3]
+
+    def test_gives_up_after_max_retries(self, retry_handler, stub_server):
+        stub_server.routes['/down'] = self.flaky_route([503] * 5)
+        with pytest.raises(UpstreamRequestException) as e:
+            retry_handler(relative_url='/down')
+        assert e.value.status == 503
+        assert stub_server.hits['/down'] == 3
+
+    def test_client_errors_are_not_retried(self, retry_handler, stub_server):
+        stub_server.routes['/missing'] = self.flaky_route([404])
+        with pytest.raises(UpstreamRequestException):
+            retry_handler(relative_url='/missing')
+        assert stub_server.hits['/missing'] == 1
+
+    def test_requests_go_through_host_rate_limiter(
+            self, stub_handler, monkeypatch):
+        registry = RateLimiterRegistry({'127.0.0.1': {'rate': 50, 'capacity': 1}})
+        monkeypatch.setattr(base_request_handler, 'rate_limiters', registry)
+        for _ in range(3):
+            stub_handler()
+        assert registry.get('127.0.0.1').waited > 0
+
+
+class TestRequestCoalescing:
+
+    def test_concurrent_identical_requests_share_one_call(
+            self, stub_handler, stub_server):
+        def slow(request):
+            time.sleep(0.05)
+            return 200, {}, b'{"n": 1}'
+
+        stub_server.routes['/calendar'] = slow
+        batch = RequestBatch(
+            [stub_handler(relative_url='/calendar', lazy=True) for _ in range(6)])
+        results = batch.run()
+        assert stub_server.hits['/calendar'] == 1
+        assert all(result.response == {'n': 1} for result in results)
+
+    def test_different_requests_are_not_coalesced(self, stub_handler, stub_server):
+        batch = RequestBatch([
+            stub_handler(relative_url='/calendar', params={'d': i}, lazy=True)
+            for i in range(3)])
+        batch.run()
+        assert stub_server.hits['/calendar'] == 3
+
+    def test_handler_classes_are_not_coalesced(self, stub_handler):
+        class OtherHandler(stub_handler):
+            def response_handler(self, response):
+                return {'parsed_by': 'other'}
+
+        assert (stub_handler(relative_url='/calendar', lazy=True)
+                .get_request_key('url', None)
+                != OtherHandler(relative_url='/calendar', lazy=True)
+                .get_request_key('url', None))
+
+    def test_coalescing_can_be_disabled(
+            self, stub_handler, stub_server, monkeypatch):
+        monkeypatch.setattr(stub_handler, 'COALESCE_METHODS', ())
+        assert stub_handler(lazy=True).get_request_key('url', None) is None
+
+
+class StreamingRequestHandler(StubRequestHandler):
+    STREAM_RESPONSE = True
+
+    def response_handler(self, response):
+        return stream_array_items(response, 'centers', chunk_size=32)
+
+
+class TestStreamingResponse:
+
+    @pytest.fixture
+    def streaming_handler(self, stub_handler, stub_server, monkeypatch):
+        monkeypatch.setattr(StreamingRequestHandler, 'URL', stub_server.url)
+        body = json.dumps({'centers': [{'center_id': i} for i in range(50)]})
+        stub_server.routes['/calendar'] = lambda request: (
+            200, {}, body.encode('utf-8'))
+        yield StreamingRequestHandler
+
+    def test_centers_are_streamed(self, streaming_handler):
+        r = streaming_handler(relative_url='/calendar')
+        assert [c['center_id'] for c in r.response] == list(range(50))
+
+    def test_connection_is_reused_after_stream(self, streaming_handler):
+        for _ in range(3):
+            list(streaming_handler(relative_url='/calendar').response)
+        host_stats = next(iter(base_request_handler.get_pool_stats().values()))
+        assert host_stats['connections_created'] == 1
+
+    def test_partially_consumed_stream_releases_connection(self, streaming_handler):
+        stream = streaming_handler(relative_url='/calendar').response
+        next(stream)
+        stream.close()
+        list(streaming_handler(relative_url='/calendar').response)
+        host_stats = next(iter(base_request_handler.get_pool_stats().values()))
+        assert host_stats['connections_created'] == 1
+
+    def test_streamed_requests_are_not_coalesced_or_cached(
+            self, streaming_handler):
+        handler = streaming_handler(relative_url='/calendar', lazy=True)
+        assert handler.get_request_key('url', None) is None
+        assert handler.get_cache_key('url', None) is None
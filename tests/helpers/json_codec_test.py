@@ -0,0 +1,76 @@
+import datetime
+import enum
+import importlib
+import json
+import sys
+
+import pytest
+
+from helpers import json_codec
+from models.filters import Filters
+from schemas.base import BaseSchema
+
+
+class Color(enum.Enum):
+    Red = 'red'
+
+
+class SampleSchema(BaseSchema):
+    name: str
+
+
+SAMPLE = {
+    'centers': [{'center_id': 1, 'name': 'ಬೆಂಗಳೂರು', 'sessions': [
+        {'min_age_limit': 18, 'available_capacity': 3.5}]}],
+}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def codec(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setitem(sys.modules, 'orjson', None)
+    yield importlib.reload(json_codec)
+    monkeypatch.undo()
+    importlib.reload(json_codec)
+
+
+def test_backend(codec):
+    assert codec.BACKEND in ('orjson', 'json')
+
+
+def test_round_trip_through_bytes(codec):
+    data = codec.dumps(SAMPLE)
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == SAMPLE
+    assert codec.loads(bytearray(data)) == SAMPLE
+    assert codec.loads(memoryview(data)) == SAMPLE
+    assert codec.loads(data.decode('utf-8')) == SAMPLE
+
+
+def test_non_str_keys_are_encoded_like_json_dumps(codec):
+    data = {1: 'a', 'b': {2: True}}
+    assert codec.loads(codec.dumps(data)) == json.loads(json.dumps(data))
+
+
+def test_to_builtins_matches_jsonable_encoder_conventions(codec):
+    created_at = datetime.datetime(2021, 5, 20, 10, 30)
+    schema = SampleSchema(id=1, name='a', created_at=created_at)
+    assert codec.to_builtins(schema) == {
+        'id': 1, 'name': 'a', 'created_at': '2021-05-20T10:30:00',
+        'updated_at': None,
+    }
+    assert codec.to_builtins({'color': Color.Red, 'filter': Filters.Age}) == {
+        'color': 'red', 'filter': 1}
+    assert codec.to_builtins({'day': datetime.date(2021, 5, 20)}) == {
+        'day': '2021-05-20'}
+    assert sorted(codec.to_builtins({1, 2})) == [1, 2]
+
+
+def test_to_builtins_of_model_uses_loaded_columns(codec, test_model):
+    obj = test_model(name='row', test_int=3)
+    assert codec.to_builtins(obj) == {'name': 'row', 'test_int': 3}
+
+
+def test_unsupported_type_raises(codec):
+    with pytest.raises(TypeError):
+        codec.dumps({'a': object()})
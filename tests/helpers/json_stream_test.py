@@ -0,0 +1,93 @@
+import json
+import tracemalloc
+
+import pytest
+
+from helpers.json_stream import iter_array_items, iter_center_sessions
+
+CALENDAR = {
+    'centers': [
+        {
+            'center_id': i,
+            'name': 'Center ] "centers" {}'.format(i),
+            'address': 'ಬೆಂಗಳೂರು',
+            'sessions': [
+                {'session_id': '{}-{}'.format(i, j), 'available_capacity': j,
+                 'min_age_limit': 18, 'vaccine': 'COVISHIELD'}
+                for j in range(3)
+            ],
+        }
+        for i in range(20)
+    ]
+}
+
+
+def chunked(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 100000])
+def test_iter_array_items_across_chunk_boundaries(chunk_size):
+    data = json.dumps(CALENDAR, ensure_ascii=False, indent=1).encode('utf-8')
+    centers = list(iter_array_items(chunked(data, chunk_size), 'centers'))
+    assert centers == CALENDAR['centers']
+
+
+def test_scalar_items():
+    data = b'{"meta": {"x": 1}, "values": [1, 22, 333, "a", null, true]}'
+    assert list(iter_array_items(chunked(data, 2), 'values')) == [
+        1, 22, 333, 'a', None, True]
+
+
+def test_empty_array():
+    assert list(iter_array_items([b'{"centers": []}'], 'centers')) == []
+
+
+def test_missing_key_yields_nothing():
+    assert list(iter_array_items([b'{"error": "none"}'], 'centers')) == []
+
+
+def test_non_array_value_raises():
+    with pytest.raises(ValueError):
+        list(iter_array_items([b'{"centers": {}}'], 'centers'))
+
+
+def test_truncated_stream_raises():
+    data = json.dumps(CALENDAR).encode('utf-8')[:-40]
+    with pytest.raises(ValueError):
+        list(iter_array_items(chunked(data, 512), 'centers'))
+
+
+def test_items_are_yielded_before_the_stream_ends():
+    data = json.dumps(CALENDAR).encode('utf-8')
+    consumed = []
+
+    def chunks():
+        for chunk in chunked(data, 256):
+            consumed.append(len(chunk))
+            yield chunk
+
+    first = next(iter_array_items(chunks(), 'centers'))
+    assert first == CALENDAR['centers'][0]
+    assert sum(consumed) < len(data)
+
+
+def test_peak_memory_does_not_grow_with_payload():
+    center = CALENDAR['centers'][0]
+    count = 2000
+    data = json.dumps({'centers': [center] * count}).encode('utf-8')
+    tracemalloc.start()
+    for _ in iter_array_items(chunked(data, 16 * 1024), 'centers'):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < len(data) / 4
+
+
+def test_iter_center_sessions():
+    pairs = list(iter_center_sessions(CALENDAR['centers'][:2]))
+    assert len(pairs) == 6
+    center, session = pairs[4]
+    assert center['center_id'] == 1
+    assert session['session_id'] == '1-1'
+    assert list(iter_center_sessions([{'center_id': 1}])) == []
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+
+from helpers.rate_limiter import RateLimiterRegistry, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_up_to_capacity_without_waiting():
+    bucket = TokenBucket(rate=1, capacity=3, clock=FakeClock())
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_waits_queue_up_at_the_configured_rate():
+    bucket = TokenBucket(rate=2, capacity=1, clock=FakeClock())
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+    assert bucket.waited == 1.5
+
+
+def test_tokens_refill_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+    bucket.reserve(2)
+    clock.now = 1
+    assert bucket.reserve() == 0.0
+    clock.now = 100
+    bucket.reserve()
+    assert bucket.tokens == 1
+
+
+def test_bucket_is_shared_across_threads():
+    bucket = TokenBucket(rate=1, capacity=10, clock=FakeClock())
+    threads = [threading.Thread(target=bucket.reserve) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bucket.tokens == -10
+    assert bucket.waited == sum(range(1, 11))
+
+
+def test_acquire_async():
+    bucket = TokenBucket(rate=1000, capacity=1)
+
+    async def acquire_all():
+        await asyncio.gather(*(bucket.acquire_async() for _ in range(3)))
+
+    asyncio.run(acquire_all())
+    assert bucket.tokens <= -1
+
+
+def test_registry_only_limits_configured_hosts():
+    registry = RateLimiterRegistry({'a.com': {'rate': 5, 'capacity': 2}})
+    bucket = registry.get('a.com')
+    assert bucket is registry.get('a.com')
+    assert bucket.rate == 5
+    assert bucket.capacity == 2
+    assert registry.get('b.com') is None
+    assert registry.get(None) is None
+
+
+def test_registry_share_scales_new_and_existing_buckets():
+    registry = RateLimiterRegistry(
+        {'a.com': {'rate': 6, 'capacity': 10}, 'b.com': {'rate': 3}},
+        share=0.5)
+    bucket = registry.get('a.com')
+    assert (bucket.rate, bucket.capacity) == (3, 5)
+    registry.set_share(1 / 3)
+    assert registry.get('a.com') is bucket
+    assert bucket.rate == pytest.approx(2)
+    assert bucket.capacity == pytest.approx(10 / 3)
+    assert bucket.tokens <= bucket.capacity
+    assert registry.get('b.com').rate == pytest.approx(1)
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from errors import UpstreamRequestException
+from helpers.base_request_handler import BaseRequestHandler
+from helpers.request_batch import RequestBatch
+
+
+class MockLazyRequestHandler(BaseRequestHandler):
+    URL = ''
+    LAZY = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return self.URL
+
+    def response_handler(self, response) -> dict:
+        if response.status >= 300:
+            raise ValueError(response.status)
+        return json.loads(response.data)
+
+
+@pytest.fixture
+def lazy_handler(stub_server, monkeypatch):
+    monkeypatch.setattr(MockLazyRequestHandler, 'URL', stub_server.url)
+    yield MockLazyRequestHandler
+
+
+def test_lazy_handler_does_not_fire_on_init(lazy_handler, stub_server):
+    handler = lazy_handler(relative_url='/lazy')
+    assert handler.response == {}
+    assert '/lazy' not in stub_server.hits
+    assert handler.execute()['path'] == '/lazy'
+    assert stub_server.hits['/lazy'] == 1
+
+
+def test_lazy_kwarg_overrides_class_attribute(lazy_handler, stub_server):
+    handler = lazy_handler(relative_url='/eager', lazy=False)
+    assert handler.response['path'] == '/eager'
+
+
+def test_batch_returns_results_in_order(lazy_handler):
+    batch = RequestBatch(
+        [lazy_handler(relative_url='/b/{}'.format(i)) for i in range(12)],
+        max_workers=4)
+    results = batch.run()
+    assert len(results) == 12
+    assert all(result.ok for result in results)
+    assert [r.response['path'] for r in results] == [
+        '/b/{}'.format(i) for i in range(12)]
+
+
+def test_batch_reports_per_request_errors(lazy_handler, stub_server):
+    stub_server.routes['/missing'] = lambda request: (404, {}, b'')
+    batch = RequestBatch()
+    batch.add(lazy_handler(relative_url='/found'))
+    batch.add(lazy_handler(relative_url='/missing'))
+    found, missing = batch.run()
+    assert found.ok
+    assert not missing.ok
+    assert isinstance(missing.error, UpstreamRequestException)
+    assert missing.response is None
+
+
+def test_empty_batch():
+    assert RequestBatch().run() == []
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from helpers.retry_policy import RetryPolicy
+
+
+def test_should_retry():
+    policy = RetryPolicy(max_retries=2, statuses=[429, 503])
+    assert policy.should_retry(0, 429)
+    assert policy.should_retry(1, 503)
+    assert not policy.should_retry(2, 503)
+    assert not policy.should_retry(0, 404)
+    assert not policy.should_retry(0, 200)
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=5, rand=lambda: 1.0)
+    assert [policy.get_backoff(n) for n in range(5)] == [1, 2, 4, 5, 5]
+    policy.rand = lambda: 0.5
+    assert policy.get_backoff(2) == 2
+
+
+def test_retry_after_seconds_take_precedence():
+    policy = RetryPolicy(rand=lambda: 1.0)
+    assert policy.get_backoff(0, '7') == 7
+    assert policy.get_backoff(0, '-1') == 0
+
+
+def test_retry_after_is_capped():
+    policy = RetryPolicy(max_backoff=30)
+    assert policy.get_backoff(0, '3600') == 30
+
+
+def test_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = RetryPolicy.parse_retry_after(format_datetime(retry_at, usegmt=True))
+    assert 25 < delay <= 30
+
+
+def test_invalid_retry_after_is_ignored():
+    assert RetryPolicy.parse_retry_after('soon') is None
+    assert RetryPolicy.parse_retry_after(None) is None
+
+
+def test_wait_uses_sleep():
+    slept = []
+    policy = RetryPolicy(backoff_factor=1, rand=lambda: 1.0, sleep=slept.append)
+    policy.wait(3)
+    assert slept == [8]
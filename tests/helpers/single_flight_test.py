@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from helpers.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'result'
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do('k', work)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ['result'] * 5
+    assert flight.stats() == {'executed': 1, 'coalesced': 4}
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight()
+    assert flight.do('k', lambda: 1) == 1
+    assert flight.do('k', lambda: 2) == 2
+
+
+def test_errors_are_shared_with_waiters():
+    flight = SingleFlight()
+    errors = []
+
+    def fail():
+        time.sleep(0.05)
+        raise ValueError
+
+    def call():
+        try:
+            flight.do('k', fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+    assert flight.do('k', lambda: 'recovered') == 'recovered'
+
+
+def test_do_async_coalesces_tasks():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do_async('k', work) for _ in range(4)))
+
+    assert asyncio.run(main()) == ['result'] * 4
+    assert len(calls) == 1
+
+
+def test_do_async_propagates_errors():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do_async('k', fail) for _ in range(2)),
+            return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+    async def single():
+        await flight.do_async('k', fail)
+
+    with pytest.raises(ValueError):
+        asyncio.run(single())
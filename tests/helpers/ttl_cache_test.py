@@ -0,0 +1,61 @@
+from helpers.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hit_ratio'] == 0.5
+
+
+def test_entries_expire_but_stay_stale():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set('a', 1)
+    clock.now = 9
+    assert 'a' in cache
+    clock.now = 10
+    assert 'a' not in cache
+    assert cache.get('a') is None
+    assert cache.get_stale('a') == 1
+
+
+def test_per_entry_ttl_overrides_default():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set('a', 1, ttl=1)
+    clock.now = 2
+    assert cache.get('a') is None
+
+
+def test_lru_eviction():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_pop_and_clear():
+    cache = TTLCache()
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.pop('a') == 1
+    assert cache.pop('a') is None
+    cache.clear()
+    assert len(cache) == 0
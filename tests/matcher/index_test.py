@@ -0,0 +1,174 @@
+import random
+
+import pytest
+from pydantic import BaseModel
+
+from crud.base import CRUDBase
+from matcher.index import (
+    AlertConfigIndex, AlertConfigIndexListener, ConfiguredFilterIndexListener)
+from models.alert_config import AlertConfig
+from models.district import District
+from models.filters import ConfiguredFilter, Evaluators, Filters
+from models.state import State  # noqa: F401
+
+FILTER_CHOICES = [
+    (Filters.Vaccine, Evaluators.Equals, 'COVAXIN'),
+    (Filters.Vaccine, Evaluators.In, 'COVISHIELD,SPUTNIK V'),
+    (Filters.Age, Evaluators.Equals, '18'),
+    (Filters.Age, Evaluators.GreaterThan, '18'),
+    (Filters.Age, Evaluators.LessThan, '45'),
+    (Filters.Age, Evaluators.In, '40,45'),
+    (Filters.Dose, Evaluators.Equals, '1'),
+    (Filters.Dose, Evaluators.GreaterThan, '1'),
+    (Filters.Dose, Evaluators.In, '1,2'),
+]
+
+
+def make_config(_id, district_id, filters, filter_ids=None):
+    filter_ids = filter_ids or [None] * len(filters)
+    return AlertConfig(
+        id=_id, district_id=district_id, chat_id='c', name='n',
+        configured_filters=[
+            ConfiguredFilter(id=fid, filter=f, evaluator=e, value=v)
+            for fid, (f, e, v) in zip(filter_ids, filters)
+        ])
+
+
+def random_session(rng):
+    return {
+        'vaccine': rng.choice(['COVAXIN', 'COVISHIELD', 'SPUTNIK V']),
+        'min_age_limit': rng.choice([18, 40, 45]),
+        'available_capacity_dose1': rng.choice([0, 4]),
+        'available_capacity_dose2': rng.choice([0, 4]),
+    }
+
+
+class TestAlertConfigIndex:
+
+    def test_match_agrees_with_brute_force(self):
+        rng = random.Random(3)
+        index = AlertConfigIndex()
+        configs = [
+            make_config(i, rng.choice([1, 2]),
+                        rng.sample(FILTER_CHOICES, rng.randint(0, 3)))
+            for i in range(1, 400)
+        ]
+        for config in configs:
+            index.add(config)
+        for _ in range(200):
+            session = random_session(rng)
+            district_id = rng.choice([1, 2])
+            expected = sorted(
+                c.id for c in configs if c.district_id == district_id
+                and index.compiler.compile(c)(session))
+            assert index.match(district_id, session) == expected
+            assert set(expected) <= index.candidates(district_id, session)
+
+    def test_candidates_are_scoped_to_district(self):
+        index = AlertConfigIndex()
+        index.add(make_config(1, 1, []))
+        index.add(make_config(2, 2, []))
+        assert index.candidates(1, {}) == {1}
+        assert index.candidates(3, {}) == set()
+
+    def test_vaccine_lookup_skips_other_vaccines(self):
+        index = AlertConfigIndex()
+        index.add(make_config(1, 1, [FILTER_CHOICES[0]]))
+        index.add(make_config(2, 1, [FILTER_CHOICES[1]]))
+        assert index.candidates(1, {'vaccine': 'covaxin'}) == {1}
+
+    def test_remove(self):
+        index = AlertConfigIndex()
+        for i, filters in enumerate([[FILTER_CHOICES[3]], [FILTER_CHOICES[4]],
+                                     [FILTER_CHOICES[5]], []], start=1):
+            index.add(make_config(i, 1, filters, filter_ids=[10 + i] * len(filters)))
+        for i in range(1, 5):
+            index.remove(i)
+        assert len(index) == 0
+        assert index.districts == {}
+        assert index.filter_owners == {}
+        index.remove(1)
+
+    def test_re_adding_replaces_previous_entry(self):
+        index = AlertConfigIndex()
+        index.add(make_config(1, 1, [FILTER_CHOICES[0]]))
+        config = make_config(1, 2, [FILTER_CHOICES[2]])
+        index.compiler.invalidate(1)
+        index.add(config)
+        assert index.candidates(1, {'vaccine': 'COVAXIN'}) == set()
+        assert index.match(2, {'min_age_limit': 18}) == [1]
+
+
+class AlertConfigSchema(BaseModel):
+    district_id: int
+    chat_id: str
+    name: str
+
+
+class ConfiguredFilterSchema(BaseModel):
+    alert_config_id: int
+    filter: Filters
+    evaluator: Evaluators
+    value: str
+
+
+class TestIndexWithDatabase:
+
+    @pytest.fixture
+    def district(self, db_with_add):
+        district = District(name='d', external_id=1)
+        db_with_add.add(district)
+        db_with_add.flush()
+        yield district
+
+    def add_config(self, db, district, *filters):
+        config = AlertConfig(district_id=district.id, chat_id='c', name='n')
+        db.add(config)
+        db.flush()
+        for f, e, v in filters:
+            db.add(ConfiguredFilter(
+                alert_config_id=config.id, filter=f, evaluator=e, value=v))
+        db.flush()
+        return config
+
+    def test_rebuild(self, db_with_add, district):
+        ids = [self.add_config(db_with_add, district, FILTER_CHOICES[0]).id
+               for _ in range(5)]
+        db_with_add.expire_all()
+        index = AlertConfigIndex()
+        index.rebuild(db_with_add, chunk_size=2)
+        assert len(index) == 5
+        assert index.match(district.id, {'vaccine': 'COVAXIN'}) == ids
+
+    def test_rebuild_drops_compiled_predicates_of_deleted_configs(
+            self, db_with_add, district):
+        kept = self.add_config(db_with_add, district, FILTER_CHOICES[0])
+        index = AlertConfigIndex()
+        deleted = make_config(99999, district.id, [FILTER_CHOICES[0]])
+        index.compiler.compile(deleted)
+        index.rebuild(db_with_add)
+        assert len(index.compiler) == len(index)
+        assert index.compiler.get(kept.id) is not None
+
+    def test_listeners_keep_index_in_sync(self, db_with_add, district):
+        index = AlertConfigIndex()
+        config_crud = CRUDBase(AlertConfig)
+        filter_crud = CRUDBase(ConfiguredFilter)
+        config_crud.add_listener(AlertConfigIndexListener(index))
+        filter_crud.add_listener(ConfiguredFilterIndexListener(index))
+
+        config = config_crud.create(db_with_add, AlertConfigSchema(
+            district_id=district.id, chat_id='c', name='n'))
+        assert index.match(district.id, {'vaccine': 'COVISHIELD'}) == [config.id]
+
+        configured_filter = filter_crud.create(db_with_add, ConfiguredFilterSchema(
+            alert_config_id=config.id, filter=Filters.Vaccine,
+            evaluator=Evaluators.Equals, value='COVAXIN'))
+        assert index.match(district.id, {'vaccine': 'COVISHIELD'}) == []
+        assert index.match(district.id, {'vaccine': 'COVAXIN'}) == [config.id]
+
+        filter_crud.remove(db_with_add, configured_filter)
+        assert index.match(district.id, {'vaccine': 'COVISHIELD'}) == [config.id]
+
+        config_crud.remove(db_with_add, config)
+        assert len(index) == 0
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+import pytest
+
+import errors
+from matcher.predicates import (
+    CompiledAlertConfig, Condition, PredicateCompiler, parse_value)
+from models.alert_config import AlertConfig
+from models.district import District  # noqa: F401
+from models.filters import ConfiguredFilter, Evaluators, Filters
+from models.state import State  # noqa: F401
+
+SESSION = {
+    'vaccine': 'COVISHIELD',
+    'min_age_limit': 18,
+    'available_capacity': 10,
+    'available_capacity_dose1': 10,
+    'available_capacity_dose2': 0,
+}
+
+
+def make_config(*filters, _id=1, updated_at=datetime(2021, 5, 20)):
+    return AlertConfig(
+        id=_id, district_id=5, chat_id='c', name='n', updated_at=updated_at,
+        configured_filters=[
+            ConfiguredFilter(filter=f, evaluator=e, value=v) for f, e, v in filters
+        ])
+
+
+class TestParseValue:
+
+    def test_scalars(self):
+        assert parse_value(Filters.Vaccine, Evaluators.Equals, ' covaxin ') == 'COVAXIN'
+        assert parse_value(Filters.Age, Evaluators.GreaterThan, '40') == 40
+        assert parse_value(Filters.Dose, Evaluators.Equals, '2') == 2
+
+    def test_in_becomes_frozenset(self):
+        assert parse_value(Filters.Vaccine, Evaluators.In, 'covaxin, Covishield,') == \
+            frozenset({'COVAXIN', 'COVISHIELD'})
+        assert parse_value(Filters.Age, Evaluators.In, '18,45') == frozenset({18, 45})
+
+    @pytest.mark.parametrize('filter_, evaluator, raw', [
+        (Filters.Age, Evaluators.Equals, 'eighteen'),
+        (Filters.Dose, Evaluators.Equals, '3'),
+        (Filters.Vaccine, Evaluators.GreaterThan, 'COVAXIN'),
+    ])
+    def test_invalid_values_raise(self, filter_, evaluator, raw):
+        with pytest.raises(errors.InvalidInputException):
+            parse_value(filter_, evaluator, raw)
+
+
+class TestCompiledAlertConfig:
+
+    @pytest.mark.parametrize('filters, expected', [
+        ([], True),
+        ([(Filters.Vaccine, Evaluators.Equals, 'covishield')], True),
+        ([(Filters.Vaccine, Evaluators.In, 'COVAXIN,SPUTNIK V')], False),
+        ([(Filters.Age, Evaluators.Equals, '18')], True),
+        ([(Filters.Age, Evaluators.GreaterThan, '18')], False),
+        ([(Filters.Age, Evaluators.LessThan, '45')], True),
+        ([(Filters.Age, Evaluators.In, '45')], False),
+        ([(Filters.Dose, Evaluators.Equals, '1')], True),
+        ([(Filters.Dose, Evaluators.Equals, '2')], False),
+        ([(Filters.Dose, Evaluators.GreaterThan, '1')], False),
+        ([(Filters.Dose, Evaluators.LessThan, '2')], True),
+        ([(Filters.Dose, Evaluators.In, '1,2')], True),
+        ([(Filters.Age, Evaluators.Equals, '18'),
+          (Filters.Vaccine, Evaluators.Equals, 'COVAXIN')], False),
+    ])
+    def test_matches(self, filters, expected):
+        compiled = CompiledAlertConfig.from_config(make_config(*filters))
+        assert compiled(SESSION) is expected
+
+    def test_missing_session_fields_do_not_match(self):
+        compiled = CompiledAlertConfig.from_config(
+            make_config((Filters.Dose, Evaluators.Equals, '1')))
+        assert not compiled({})
+
+    def test_attributes(self):
+        compiled = CompiledAlertConfig.from_config(
+            make_config((Filters.Age, Evaluators.Equals, '18'), _id=7))
+        assert compiled.id == 7
+        assert compiled.district_id == 5
+        assert compiled.conditions == (
+            Condition(Filters.Age, Evaluators.Equals, 18),)
+
+
+class TestPredicateCompiler:
+
+    def test_compiled_configs_are_reused(self):
+        compiler = PredicateCompiler()
+        config = make_config((Filters.Age, Evaluators.Equals, '18'))
+        first = compiler.compile(config)
+        assert compiler.compile(config) is first
+        assert (compiler.hits, compiler.misses) == (1, 1)
+        assert compiler.get(config.id) is first
+
+    def test_recompiles_when_updated_at_changes(self):
+        compiler = PredicateCompiler()
+        config = make_config((Filters.Age, Evaluators.Equals, '18'))
+        first = compiler.compile(config)
+        config.updated_at = datetime(2021, 5, 21)
+        config.configured_filters[0].value = '45'
+        second = compiler.compile(config)
+        assert second is not first
+        assert not second(SESSION)
+
+    @pytest.mark.parametrize('edit', [
+        lambda config: setattr(config.configured_filters[0], 'value', '45'),
+        lambda config: config.configured_filters.append(ConfiguredFilter(
+            filter=Filters.Vaccine, evaluator=Evaluators.Equals,
+            value='covaxin')),
+        lambda config: config.configured_filters.pop(),
+    ])
+    def test_recompiles_when_filters_change(self, edit):
+        compiler = PredicateCompiler()
+        config = make_config((Filters.Age, Evaluators.Equals, '18'))
+        assert compiler.compile(config)(SESSION)
+        edit(config)
+        recompiled = compiler.compile(config)
+        assert compiler.misses == 2
+        assert recompiled(SESSION) == (not config.configured_filters)
+
+    def test_invalidate_and_clear(self):
+        compiler = PredicateCompiler()
+        compiler.compile_all([make_config(_id=1), make_config(_id=2)])
+        assert len(compiler) == 2
+        compiler.invalidate(1)
+        assert compiler.get(1) is None
+        compiler.clear()
+        assert len(compiler) == 0
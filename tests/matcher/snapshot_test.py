@@ -0,0 +1,89 @@
+import copy
+
+from matcher.snapshot import (
+    DeltaKind, SnapshotStore, alerting_sessions, fingerprint)
+
+
+def calendar(*sessions):
+    return [{
+        'center_id': 1, 'fee_type': 'Free',
+        'sessions': [
+            {'session_id': session_id, 'date': '20-05-2021',
+             'vaccine': 'COVAXIN', 'min_age_limit': 18,
+             'available_capacity': available, 'slots': ['09:00AM-11:00AM']}
+            for session_id, available in sessions
+        ],
+    }]
+
+
+def kinds(deltas):
+    return [(d.kind, d.session['session_id']) for d in deltas]
+
+
+def test_first_poll_reports_sessions_with_capacity():
+    store = SnapshotStore()
+    deltas = store.diff(1, calendar(('a', 5), ('b', 0)))
+    assert kinds(deltas) == [(DeltaKind.New, 'a')]
+    assert deltas[0].previous_capacity == 0
+
+
+def test_unchanged_poll_has_no_deltas():
+    store = SnapshotStore()
+    store.diff(1, calendar(('a', 5), ('b', 0)))
+    assert store.diff(1, calendar(('a', 5), ('b', 0))) == []
+
+
+def test_capacity_changes():
+    store = SnapshotStore()
+    store.diff(1, calendar(('a', 5), ('b', 0), ('c', 4)))
+    deltas = store.diff(1, calendar(('a', 0), ('b', 3), ('c', 2), ('d', 1)))
+    assert kinds(deltas) == [
+        (DeltaKind.CapacityExhausted, 'a'),
+        (DeltaKind.CapacityIncreased, 'b'),
+        (DeltaKind.New, 'd'),
+    ]
+    assert deltas[0].previous_capacity == 5
+    assert [s['session_id'] for s in alerting_sessions(deltas)] == ['b', 'd']
+
+
+def test_districts_are_independent():
+    store = SnapshotStore()
+    store.diff(1, calendar(('a', 5)))
+    assert kinds(store.diff(2, calendar(('a', 5)))) == [(DeltaKind.New, 'a')]
+    store.forget(1)
+    assert store.get(1) is None
+    assert len(store) == 1
+
+
+def test_dropped_sessions_leave_the_snapshot():
+    store = SnapshotStore()
+    store.diff(1, calendar(('a', 5), ('b', 5)))
+    store.diff(1, calendar(('a', 5)))
+    assert set(store.get(1)) == {'a'}
+
+
+def test_sessions_without_id_are_skipped():
+    store = SnapshotStore()
+    deltas = store.diff(1, calendar(('a', 5), (None, 5), (None, 3)))
+    assert kinds(deltas) == [(DeltaKind.New, 'a')]
+    assert set(store.get(1)) == {'a'}
+    assert store.stats()['sessions_skipped'] == 2
+
+
+def test_fingerprint_tracks_visible_fields():
+    center = calendar(('a', 5))[0]
+    session = center['sessions'][0]
+    changed = copy.deepcopy(session)
+    changed['slots'] = ['11:00AM-01:00PM']
+    assert fingerprint(center, session) == fingerprint(center, copy.deepcopy(session))
+    assert fingerprint(center, session) != fingerprint(center, changed)
+
+
+def test_stats():
+    store = SnapshotStore()
+    store.diff(1, calendar(('a', 5), ('b', 5)))
+    store.diff(1, calendar(('a', 5), ('b', 5)))
+    stats = store.stats()
+    assert stats['sessions_seen'] == 4
+    assert stats['deltas_emitted'] == 2
+    assert stats['delta_ratio'] == 0.5
@@ -0,0 +1,113 @@
+import random
+
+import numpy as np
+
+from matcher.predicates import CompiledAlertConfig, Condition
+from matcher.vectorized import BatchMatcher, SessionColumns
+from models.filters import Evaluators, Filters
+
+VACCINES = ['COVISHIELD', 'COVAXIN', 'SPUTNIK V']
+
+CONDITIONS = [
+    Condition(Filters.Vaccine, Evaluators.Equals, 'COVAXIN'),
+    Condition(Filters.Vaccine, Evaluators.Equals, 'ZYCOV-D'),
+    Condition(Filters.Vaccine, Evaluators.In, frozenset({'COVISHIELD', 'SPUTNIK V'})),
+    Condition(Filters.Age, Evaluators.Equals, 18),
+    Condition(Filters.Age, Evaluators.GreaterThan, 18),
+    Condition(Filters.Age, Evaluators.LessThan, 45),
+    Condition(Filters.Age, Evaluators.In, frozenset({45})),
+    Condition(Filters.Dose, Evaluators.Equals, 1),
+    Condition(Filters.Dose, Evaluators.Equals, 2),
+    Condition(Filters.Dose, Evaluators.GreaterThan, 1),
+    Condition(Filters.Dose, Evaluators.In, frozenset({1, 2})),
+]
+
+
+def random_sessions(rng, count):
+    return [{
+        'session_id': str(i),
+        'date': '{:02d}-05-2021'.format(rng.randint(1, 28)),
+        'vaccine': rng.choice(VACCINES).lower() if i % 7 == 0 else rng.choice(VACCINES),
+        'min_age_limit': rng.choice([18, 40, 45]),
+        'available_capacity_dose1': rng.choice([0, 0, 3]),
+        'available_capacity_dose2': rng.choice([0, 5]),
+    } for i in range(count)]
+
+
+def random_configs(rng, count):
+    return [
+        CompiledAlertConfig(
+            i, 1, None, rng.sample(CONDITIONS, rng.randint(0, 3)))
+        for i in range(count)
+    ]
+
+
+def test_session_columns():
+    columns = SessionColumns.from_sessions([
+        {'vaccine': 'covaxin', 'min_age_limit': 18, 'date': '20-05-2021',
+         'available_capacity_dose1': 2, 'available_capacity_dose2': 0},
+        {'vaccine': 'COVISHIELD', 'min_age_limit': 45},
+    ])
+    assert len(columns) == 2
+    assert columns.min_age.tolist() == [18, 45]
+    assert columns.dose1.tolist() == [2, 0]
+    assert columns.dose2.tolist() == [0, 0]
+    assert columns.vaccine.tolist() == [
+        columns.code('COVAXIN'), columns.code('COVISHIELD')]
+    assert columns.date[0] == np.datetime64('2021-05-20')
+    assert np.isnat(columns.date[1])
+
+
+def test_matches_agree_with_compiled_predicates():
+    rng = random.Random(7)
+    sessions = random_sessions(rng, 300)
+    configs = random_configs(rng, 500)
+    matches = BatchMatcher(configs).match(SessionColumns.from_sessions(sessions))
+    expected = {
+        (config.id, index)
+        for config in configs
+        for index, session in enumerate(sessions)
+        if config(session)
+    }
+    assert matches.shape == (len(expected), 2)
+    assert set(map(tuple, matches.tolist())) == expected
+
+
+def test_missing_age_limit_matches_the_same_in_both_paths():
+    sessions = [{'vaccine': 'COVAXIN', 'available_capacity_dose1': 1},
+                {'vaccine': 'COVAXIN', 'min_age_limit': None}]
+    configs = [CompiledAlertConfig(i, 1, None, [condition])
+               for i, condition in enumerate(CONDITIONS)]
+    matches = BatchMatcher(configs).match(SessionColumns.from_sessions(sessions))
+    expected = {
+        (config.id, index)
+        for config in configs
+        for index, session in enumerate(sessions)
+        if config(session)
+    }
+    assert set(map(tuple, matches.tolist())) == expected
+    # `< 45` holds for a missing age limit, `> 18` does not
+    assert (5, 0) in expected and (4, 0) not in expected
+
+
+def test_configs_with_same_filters_share_a_group():
+    configs = [
+        CompiledAlertConfig(1, 1, None, [CONDITIONS[0], CONDITIONS[3]]),
+        CompiledAlertConfig(2, 1, None, [CONDITIONS[3], CONDITIONS[0]]),
+        CompiledAlertConfig(3, 1, None, []),
+    ]
+    matcher = BatchMatcher(configs)
+    assert len(matcher.groups) == 2
+    columns = SessionColumns.from_sessions(
+        [{'vaccine': 'COVAXIN', 'min_age_limit': 18}])
+    groups = sorted(matcher.match_groups(columns), key=lambda g: g.size)
+    assert groups[0].config_ids.tolist() == [3]
+    assert groups[1].config_ids.tolist() == [1, 2]
+    assert groups[1].session_indices.tolist() == [0]
+
+
+def test_no_matches():
+    matcher = BatchMatcher([CompiledAlertConfig(1, 1, None, [CONDITIONS[1]])])
+    matches = matcher.match(SessionColumns.from_sessions([{'vaccine': 'COVAXIN'}]))
+    assert matches.shape == (0, 2)
+    assert BatchMatcher([]).match(SessionColumns.from_sessions([])).shape == (0, 2)
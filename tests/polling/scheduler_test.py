@@ -0,0 +1,162 @@
+import threading
+
+import pytest
+
+from polling.scheduler import (
+    AdaptiveScheduler, DistrictState, SimulationClock, simulate)
+
+OPTIONS = dict(
+    base_interval=60, min_interval=10, max_interval=900,
+    churn_weight=4, churn_decay=0.5, max_requests_per_second=100)
+
+
+def state(subscribers, churn=0.0):
+    district = DistrictState(1, subscribers)
+    district.churn = churn
+    return district
+
+
+def calendar(capacity):
+    return [{'center_id': 1, 'sessions': [
+        {'session_id': 'a', 'available_capacity': capacity}]}]
+
+
+class TestIntervals:
+
+    def test_more_subscribers_poll_more_often(self):
+        scheduler = AdaptiveScheduler(**OPTIONS)
+        intervals = [scheduler.desired_interval(state(n)) for n in (1, 10, 100)]
+        assert intervals == sorted(intervals, reverse=True)
+        assert len(set(intervals)) == 3
+
+    def test_churn_polls_more_often(self):
+        scheduler = AdaptiveScheduler(**OPTIONS)
+        assert (scheduler.desired_interval(state(3, churn=1.0))
+                < scheduler.desired_interval(state(3, churn=0.0)))
+
+    def test_intervals_are_clamped(self):
+        scheduler = AdaptiveScheduler(**OPTIONS)
+        assert scheduler.desired_interval(state(0)) == 900
+        assert scheduler.desired_interval(state(10 ** 6, churn=1.0)) == 10
+
+    def test_intervals_stretch_to_respect_rate_cap(self):
+        options = dict(OPTIONS, max_requests_per_second=1)
+        scheduler = AdaptiveScheduler(clock=SimulationClock(), **options)
+        for district_id in range(100):
+            scheduler.set_subscribers(district_id, 1000)
+        assert scheduler.desired_rate == pytest.approx(100 / 10)
+        assert scheduler.stretch == pytest.approx(10)
+        assert scheduler.interval(scheduler.districts[0]) == pytest.approx(100)
+        for district_id in range(100):
+            scheduler.remove(district_id)
+        assert scheduler.desired_rate == pytest.approx(0)
+        assert scheduler.stretch == 1
+
+
+class TestQueue:
+
+    def test_districts_come_due_in_order(self):
+        clock = SimulationClock()
+        scheduler = AdaptiveScheduler(clock=clock, **OPTIONS)
+        scheduler.set_subscribers(1, 1)
+        scheduler.set_subscribers(2, 100)
+        assert scheduler.pop_due() == (1, None)
+        assert scheduler.pop_due() == (2, None)
+        assert scheduler.pop_due() == (None, None)
+        due_1 = scheduler.record_poll(1, 0)
+        due_2 = scheduler.record_poll(2, 0)
+        assert due_2 < due_1
+        assert scheduler.pop_due() == (None, due_2)
+        clock.now = due_2
+        assert scheduler.pop_due() == (2, None)
+
+    def test_removed_districts_are_skipped(self):
+        scheduler = AdaptiveScheduler(clock=SimulationClock(), **OPTIONS)
+        scheduler.set_subscribers(1, 1)
+        scheduler.set_subscribers(2, 1)
+        scheduler.remove(1)
+        assert scheduler.pop_due() == (2, None)
+        assert scheduler.record_poll(1, 0) is None
+        assert len(scheduler) == 1
+
+    def test_new_subscribers_bring_the_next_poll_forward(self):
+        clock = SimulationClock()
+        scheduler = AdaptiveScheduler(clock=clock, **OPTIONS)
+        scheduler.set_subscribers(1, 0)
+        scheduler.pop_due()
+        scheduler.record_poll(1, 0)
+        assert scheduler.peek() == (900, 1)
+        scheduler.set_subscribers(1, 50)
+        assert scheduler.peek()[0] < 900
+
+
+def test_run_polls_until_stopped():
+    scheduler = AdaptiveScheduler(
+        base_interval=0.02, min_interval=0.01, max_interval=0.05,
+        max_requests_per_second=1000)
+    polled = []
+    done = threading.Event()
+
+    def poll(district_id):
+        polled.append(district_id)
+        if len(polled) >= 10:
+            scheduler.stop()
+            done.set()
+        return 0
+
+    scheduler.set_subscribers(1, 5)
+    scheduler.set_subscribers(2, 5)
+    thread = threading.Thread(target=scheduler.run, args=(poll,))
+    thread.start()
+    assert done.wait(5)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert set(polled) == {1, 2}
+
+
+def test_run_survives_failing_polls():
+    scheduler = AdaptiveScheduler(
+        base_interval=0.02, min_interval=0.01, max_interval=0.05,
+        max_requests_per_second=1000)
+    polled = []
+    done = threading.Event()
+
+    def poll(district_id):
+        polled.append(district_id)
+        if polled.count(2) >= 3:
+            scheduler.stop()
+            done.set()
+        if district_id == 1:
+            raise RuntimeError('upstream down')
+        return 0
+
+    scheduler.set_subscribers(1, 5)
+    scheduler.set_subscribers(2, 5)
+    thread = threading.Thread(target=scheduler.run, args=(poll,))
+    thread.start()
+    assert done.wait(5)
+    thread.join(5)
+    assert scheduler.errors == polled.count(1) > 0
+    assert isinstance(scheduler.last_error, RuntimeError)
+
+
+def test_simulation_favours_busy_and_changing_districts():
+    recorded = {
+        1: [calendar(n % 2) for n in range(50)],
+        2: [calendar(1)],
+        3: [calendar(1)],
+    }
+    result = simulate(
+        recorded, subscribers={1: 5, 2: 5, 3: 500}, duration=3600, **OPTIONS)
+    assert result.polls[1] > result.polls[2]
+    assert result.polls[3] > result.polls[2]
+    assert result.deltas[1] > result.deltas[2] == result.deltas[3] == 1
+
+
+def test_simulation_respects_rate_cap():
+    recorded = {district_id: [calendar(1)] for district_id in range(200)}
+    options = dict(OPTIONS, max_requests_per_second=0.5)
+    result = simulate(
+        recorded, subscribers={d: 1000 for d in recorded}, duration=600,
+        **options)
+    assert result.requests_per_second <= 0.5 + 1 / 600
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from polling.workers import ConsistentHashRing, WorkerSupervisor
+
+DISTRICTS = list(range(1, 751))
+
+
+def make_poll(worker_id):
+    def poll(district_id):
+        return 0
+    return poll
+
+
+class TestConsistentHashRing:
+
+    def test_keys_spread_over_all_nodes(self):
+        ring = ConsistentHashRing(range(4))
+        assignment = ring.assign(DISTRICTS)
+        assert sorted(sum(assignment.values(), [])) == DISTRICTS
+        for districts in assignment.values():
+            assert len(districts) == pytest.approx(len(DISTRICTS) / 4, rel=0.35)
+
+    def test_lookup_is_stable(self):
+        assert ([ConsistentHashRing(range(3)).get(d) for d in DISTRICTS]
+                == [ConsistentHashRing(range(3)).get(d) for d in DISTRICTS])
+
+    def test_adding_a_node_moves_about_one_nth_of_the_keys(self):
+        ring = ConsistentHashRing(range(4))
+        before = {d: ring.get(d) for d in DISTRICTS}
+        ring.add(4)
+        moved = [d for d in DISTRICTS if ring.get(d) != before[d]]
+        assert all(ring.get(d) == 4 for d in moved)
+        assert len(moved) == pytest.approx(len(DISTRICTS) / 5, rel=0.35)
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        ring = ConsistentHashRing(range(4))
+        before = {d: ring.get(d) for d in DISTRICTS}
+        ring.remove(2)
+        assert 2 not in ring.assign(DISTRICTS)
+        for district_id in DISTRICTS:
+            if before[district_id] != 2:
+                assert ring.get(district_id) == before[district_id]
+
+    def test_empty_ring(self):
+        with pytest.raises(LookupError):
+            ConsistentHashRing().get(1)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_supervisor_runs_and_rebalances_workers():
+    supervisor = WorkerSupervisor(
+        make_poll, {d: 5 for d in range(1, 21)}, num_workers=2,
+        scheduler_options=dict(
+            base_interval=0.05, min_interval=0.01, max_interval=0.1,
+            max_requests_per_second=1000),
+        heartbeat_interval=0.05)
+    supervisor.start()
+    try:
+        assert wait_for(lambda: supervisor.health()['healthy']
+                        and supervisor.health()['polls'] >= 20)
+        health = supervisor.health()
+        assert sum(w['assigned'] for w in health['workers'].values()) == 20
+        pids = {w['report'].pid for w in health['workers'].values()}
+        assert len(pids) == 2
+
+        assert all(w['report'].rate_share == 0.5
+                   for w in health['workers'].values())
+
+        worker_id = supervisor.add_worker()
+        assert wait_for(lambda: worker_id in supervisor.collect()
+                        and supervisor.collect()[worker_id].districts
+                        == len(supervisor.assignments[worker_id]))
+        # every worker's share of the host rate limits shrinks as well
+        assert wait_for(lambda: all(
+            r.rate_share == pytest.approx(1 / 3)
+            for r in supervisor.collect().values()))
+        supervisor.remove_worker(0)
+        assert set(supervisor.health()['workers']) == {1, worker_id}
+        assert sum(len(d) for d in supervisor.assignments.values()) == 20
+    finally:
+        supervisor.stop()
+    assert supervisor.processes == {}